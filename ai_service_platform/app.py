@@ -1,3 +1,5 @@
+import time
+_app_import_start = time.perf_counter()
 from flask import Flask, render_template, request, jsonify, Blueprint, flash, redirect, url_for, send_from_directory, Response
 from flask_sock import Sock
 from flask_cors import CORS
@@ -6,25 +8,25 @@ import os
 import json
 import uuid
 from datetime import datetime
-from services.vector_service import VectorService
-from services.rag_service import RAGService
-from services.agent_service import AgentService
-from services.speech_service import SpeechService
-from services.chat_service import ChatService
-from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, COLLECTION_NAME, AUDIO_UPLOAD_FOLDER
+from services.service_registry import get_service, warm_up, readiness, record_startup
+from services.job_service import IngestionJobService, JobQueueFullError
+from config import (
+    UPLOAD_FOLDER, ALLOWED_EXTENSIONS, COLLECTION_NAME, AUDIO_UPLOAD_FOLDER, BATCH_QUERY_MAX_SIZE,
+    VECTOR_STORE_BACKEND
+)
 import psutil
-from pymilvus import Collection
 
 # 创建蓝图
 front = Blueprint('front', __name__)
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
-# 初始化服务
-vector_service = VectorService()
-rag_service = RAGService()
-agent_service = AgentService()
-speech_service = SpeechService()
-chat_service = ChatService()
+# 服务在首次使用或后台预热时才初始化，避免阻塞应用启动
+vector_service = get_service('vector')
+rag_service = get_service('rag')
+agent_service = get_service('agent')
+speech_service = get_service('speech')
+chat_service = get_service('chat')
+ingestion_jobs = IngestionJobService()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -34,6 +36,17 @@ def allowed_file(filename):
 def index():
     return render_template('front/index.html')
 
+@front.route('/health')
+def health():
+    """存活检查，不依赖任何后端服务"""
+    return jsonify({'status': 'ok'})
+
+@front.route('/ready')
+def ready():
+    """就绪检查，返回各服务初始化状态与启动耗时"""
+    status = readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @front.route('/chat')
 def chat():
     return render_template('front/chat.html')
@@ -109,6 +122,23 @@ def query():
             }
         )
 
+@front.route('/query/batch', methods=['POST'])
+def query_batch():
+    """批量查询：{"queries": [...], "answer": false}，返回每个查询的检索结果（可选回答）"""
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        return jsonify({'error': 'queries 必须是非空的查询文本列表'}), 400
+    if len(queries) > BATCH_QUERY_MAX_SIZE:
+        return jsonify({'error': f'单次最多 {BATCH_QUERY_MAX_SIZE} 个查询'}), 400
+
+    try:
+        results = rag_service.query_batch([q.strip() for q in queries], answer=bool(data.get('answer', False)))
+        return jsonify({'results': results})
+    except Exception as e:
+        print(f"批量查询失败: {str(e)}")
+        return jsonify({'error': f'批量查询失败: {str(e)}'}), 500
+
 @front.route('/chat', methods=['POST'])
 def chat_message():
     """处理聊天请求"""
@@ -325,11 +355,25 @@ def upload_document():
                 # 保存文件
                 file.save(file_path)
                 
-                # 处理 PDF 文件
-                from services.rag_service import RAGService
-                rag_service = RAGService()
-                result = rag_service.process_pdf(file_path)
-                flash('PDF 文件处理成功', 'success')
+                # 提交后台处理任务，立即返回任务 ID
+                try:
+                    # 在任务线程中访问 RAG 服务，服务尚未就绪时不阻塞当前请求
+                    job_id = ingestion_jobs.submit(
+                        file_path,
+                        lambda path, progress: rag_service.process_pdf(path, progress=progress)
+                    )
+                except JobQueueFullError as e:
+                    if request.accept_mimetypes.best == 'application/json':
+                        return jsonify({'error': str(e)}), 429
+                    flash(str(e), 'error')
+                    return redirect(url_for('admin.upload_document'))
+                
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({
+                        'job_id': job_id,
+                        'status_url': url_for('admin.get_job', job_id=job_id)
+                    }), 202
+                flash(f'PDF 文件已提交处理，任务 ID: {job_id}', 'success')
                 return redirect(url_for('admin.index'))
             else:
                 flash('只支持 PDF 文件格式', 'error')
@@ -343,6 +387,53 @@ def upload_document():
     # GET 请求显示上传页面
     return render_template('admin/upload_document.html')
 
+BULK_ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2')
+
+@admin.route('/upload/bulk', methods=['POST'])
+def upload_bulk():
+    """批量导入：上传 zip/tar 压缩包，或以 JSON {"path": ...} 指定服务器上的目录或清单文件"""
+    if 'file' in request.files:
+        file = request.files['file']
+        if not file.filename.lower().endswith(BULK_ARCHIVE_EXTENSIONS):
+            return jsonify({'error': '只支持 zip、tar、tar.gz 压缩包'}), 400
+
+        # 压缩包原样保存，成员在处理时以流方式读取，不解压到磁盘
+        upload_dir = os.path.join(os.path.dirname(__file__), 'uploads/archives')
+        os.makedirs(upload_dir, exist_ok=True)
+        path = os.path.join(upload_dir, secure_filename(file.filename))
+        file.save(path)
+    else:
+        data = request.get_json(silent=True) or {}
+        path = data.get('path', '')
+        if not path or not os.path.exists(path):
+            return jsonify({'error': '请上传压缩包，或提供存在的目录/清单文件路径'}), 400
+
+    try:
+        job_id = ingestion_jobs.submit(
+            path,
+            lambda path, progress: rag_service.ingest_path(path, progress=progress)
+        )
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('admin.get_job', job_id=job_id)
+    }), 202
+
+@admin.route('/jobs')
+def list_jobs():
+    """列出文档处理任务"""
+    return jsonify(ingestion_jobs.list_jobs())
+
+@admin.route('/jobs/<job_id>')
+def get_job(job_id):
+    """查询文档处理任务进度"""
+    job = ingestion_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @admin.route('/upload/audio', methods=['GET', 'POST'])
 def upload_audio():
     if request.method == 'POST':
@@ -388,13 +479,21 @@ def upload_audio():
 
 @admin.route('/documents')
 def list_documents():
-    # TODO: 实现文档列表功能
-    return jsonify([])
+    """分页列出已导入的文档，数据来自文档登记表"""
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 20, type=int)
+    return jsonify(rag_service.list_documents(page, page_size))
 
-@admin.route('/documents/<doc_id>', methods=['DELETE'])
+@admin.route('/documents/<path:doc_id>', methods=['DELETE'])
 def delete_document(doc_id):
-    # TODO: 实现文档删除功能
-    return jsonify({'message': '文档已删除'})
+    """按来源名称删除文档的全部分块，批量导入的文档名称为包含文件夹的相对路径"""
+    try:
+        if not rag_service.delete_document(doc_id):
+            return jsonify({'error': 'Document not found'}), 404
+        return jsonify({'message': '文档已删除'})
+    except Exception as e:
+        print(f"删除文档失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @admin.route('/agents', methods=['GET', 'POST'])
 def manage_agents():
@@ -492,14 +591,29 @@ def serve_audio(filename):
     audio_dir = os.path.join(os.path.dirname(__file__), 'uploads/audio')
     return send_from_directory(audio_dir, filename)
 
+@admin.route('/cache/stats')
+def cache_stats():
+    """查询缓存命中统计"""
+    return jsonify(rag_service.cache_stats())
+
+@admin.route('/llm/stats')
+def llm_stats():
+    """大模型调用统计"""
+    from services.llm_client import get_llm_client
+    return jsonify(get_llm_client().stats())
+
 @admin.route('/system/status')
 def system_status():
     """显示系统状态"""
-    try:
-        collection = Collection(COLLECTION_NAME)
-        milvus_status = 'Connected'
-    except Exception as e:
-        milvus_status = f'Not Connected: {str(e)}'
+    if VECTOR_STORE_BACKEND == 'local':
+        milvus_status = 'Not Used (local vector store)'
+    else:
+        try:
+            from pymilvus import Collection
+            collection = Collection(COLLECTION_NAME)
+            milvus_status = 'Connected'
+        except Exception as e:
+            milvus_status = f'Not Connected: {str(e)}'
     
     status = {
         'cpu_percent': psutil.cpu_percent(),
@@ -514,7 +628,10 @@ def system_status():
     
     return render_template('admin/system_status.html', status=status)
 
+record_startup('app.import', time.perf_counter() - _app_import_start)
+
 def create_app():
+    start = time.perf_counter()
     app = Flask(__name__)
     CORS(app)
     app.config['SECRET_KEY'] = os.urandom(24)
@@ -531,6 +648,10 @@ def create_app():
     
     # 注册 WebSocket
     sock.init_app(app)
+    record_startup('app.create', time.perf_counter() - start)
+    
+    # 后台预热较重的服务（加载模型、连接 Milvus）
+    warm_up()
     
     return app
 
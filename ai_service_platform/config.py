@@ -6,17 +6,194 @@ MILVUS_PORT = int(os.getenv('MILVUS_PORT', '19530'))
 COLLECTION_NAME = os.getenv('COLLECTION_NAME', 'document_stor')
 VECTOR_DIM = 768
 
+# 向量索引配置，只在创建集合时生效，可用 python -m scripts.bench_index 按当前数据量评估
+# FLAT 为暴力搜索；IVF_FLAT 保存全精度向量；IVF_SQ8 将每维压缩为 1 字节（约 1/4 内存）；
+# IVF_PQ 按乘积量化进一步压缩；HNSW 为图索引，召回高、延迟低，但内存占用最大
+VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'IVF_FLAT')
+VECTOR_INDEX_NLIST = int(os.getenv('VECTOR_INDEX_NLIST', '1024'))
+# IVF_PQ 子空间数量（需整除向量维度）与每个子空间的编码位数
+VECTOR_PQ_M = int(os.getenv('VECTOR_PQ_M', '64'))
+VECTOR_PQ_NBITS = int(os.getenv('VECTOR_PQ_NBITS', '8'))
+# HNSW 每个节点的最大连接数与建图时的候选队列长度
+VECTOR_HNSW_M = int(os.getenv('VECTOR_HNSW_M', '16'))
+VECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv('VECTOR_HNSW_EF_CONSTRUCTION', '200'))
+# 搜索参数：IVF 类索引搜索的聚类数，HNSW 搜索的候选队列长度
+VECTOR_SEARCH_NPROBE = int(os.getenv('VECTOR_SEARCH_NPROBE', '10'))
+VECTOR_SEARCH_EF = int(os.getenv('VECTOR_SEARCH_EF', '64'))
+# 全精度重排的候选数量，大于返回数量时先多取候选再用写入时的 float32 向量重新计算距离，0 表示关闭；
+# 只对有损量化索引（Milvus IVF_SQ8、IVF_PQ）生效
+VECTOR_RERANK_CANDIDATES = int(os.getenv('VECTOR_RERANK_CANDIDATES', '0'))
+# 向量存储后端：milvus 或 local（进程内的内存映射存储，不依赖外部服务，适合测试和边缘部署）
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'milvus').lower()
+
 # 文件上传配置
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 AUDIO_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, 'audio')
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+# 按集合保存的搜索参数（由 bench_index --apply 写入），优先于上面的默认搜索参数
+INDEX_SETTINGS_PATH = os.getenv('INDEX_SETTINGS_PATH', os.path.join(DATA_FOLDER, 'index_settings.json'))
+# 本地向量存储（VECTOR_STORE_BACKEND=local）的数据目录
+LOCAL_VECTOR_DIR = os.getenv('LOCAL_VECTOR_DIR', os.path.join(DATA_FOLDER, 'vectors'))
+# 向量保存精度：float32 或 float16（内存与磁盘占用减半，距离仍按 float32 计算）
+LOCAL_VECTOR_DTYPE = os.getenv('LOCAL_VECTOR_DTYPE', 'float32')
+# 搜索方式：FLAT 为精确搜索；IVF 按 k-means 聚类，只扫描距离查询最近的 LOCAL_IVF_NPROBE 个聚类
+LOCAL_INDEX_TYPE = os.getenv('LOCAL_INDEX_TYPE', 'FLAT').upper()
+# IVF 聚类数，0 表示按 4 * sqrt(记录数) 自动选择
+LOCAL_IVF_NLIST = int(os.getenv('LOCAL_IVF_NLIST', '0'))
+LOCAL_IVF_NPROBE = int(os.getenv('LOCAL_IVF_NPROBE', '16'))
+# 记录数少于该值时不训练聚类，直接精确搜索
+LOCAL_IVF_MIN_ROWS = int(os.getenv('LOCAL_IVF_MIN_ROWS', '20000'))
+# 已删除记录超过该比例时压缩数据文件
+LOCAL_COMPACT_RATIO = float(os.getenv('LOCAL_COMPACT_RATIO', '0.2'))
 ALLOWED_EXTENSIONS = {'pdf', 'wav', 'mp3'}
 
+# 文档后台处理任务配置
+# 同时运行的处理任务数上限，避免占满 CPU 影响查询请求
+INGEST_MAX_WORKERS = int(os.getenv('INGEST_MAX_WORKERS', '1'))
+# 排队任务数上限，超过后拒绝新的上传
+INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', '20'))
+
+# PDF 文本提取配置
+# 提取进程数，所有导入任务共用同一个进程池；0 表示每个处理任务 2 个进程（不超过 CPU 核心数的一半），
+# 1 表示在当前进程内逐页提取
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', '0')) or \
+    min(2 * INGEST_MAX_WORKERS, max(1, (os.cpu_count() or 1) // 2))
+# 页数少于该值时不启动进程池
+PDF_EXTRACT_MIN_PAGES = int(os.getenv('PDF_EXTRACT_MIN_PAGES', '16'))
+# 每个提取任务包含的页数
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv('PDF_EXTRACT_PAGES_PER_TASK', '8'))
+
+# 文档处理流水线配置
+# 每次送入向量模型的文本块窗口大小，窗口内按长度分桶
+INGEST_EMBED_WINDOW = int(os.getenv('INGEST_EMBED_WINDOW', '256'))
+# 每次写入 Milvus 的记录数
+INGEST_INSERT_BATCH_SIZE = int(os.getenv('INGEST_INSERT_BATCH_SIZE', '512'))
+# 各阶段之间队列的最大长度
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '8'))
+
+# 批量导入配置
+# 并行处理的文档数
+BULK_INGEST_WORKERS = int(os.getenv('BULK_INGEST_WORKERS', '2'))
+# 跨文档合并写入 Milvus 的记录数
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', '5000'))
+
 # 向量模型配置
 VECTOR_MODEL_NAME = "shibing624/text2vec-base-chinese"
 
+# 向量模型推理后端：torch、onnx 或 onnx-int8（动态量化），ONNX 模型需先用 scripts/export_onnx.py 导出
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join(DATA_FOLDER, 'onnx', VECTOR_MODEL_NAME.replace('/', '--')))
+# ONNX Runtime 单次推理使用的线程数，0 表示由运行时决定
+ONNX_NUM_THREADS = int(os.getenv('ONNX_NUM_THREADS', '0'))
+
+# 向量生成批处理配置
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+# 按文本长度分桶，减少同一批次内的 padding 浪费
+EMBEDDING_BUCKET_BY_LENGTH = os.getenv('EMBEDDING_BUCKET_BY_LENGTH', 'true').lower() == 'true'
+
+# 文本分块配置
+# 分块长度单位：token（按向量模型分词器计数）或 char（按字符计数）
+CHUNK_LENGTH_UNIT = os.getenv('CHUNK_LENGTH_UNIT', 'token')
+# 每个分块的最大长度，0 表示使用向量模型的最大序列长度
+CHUNK_MAX_LENGTH = int(os.getenv('CHUNK_MAX_LENGTH', '0'))
+# 相邻分块之间重叠的长度
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '0'))
+
+# 向量缓存配置（按文本内容和模型名称缓存向量，重复导入时跳过模型计算）
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join(DATA_FOLDER, 'embedding_cache.db'))
+# 缓存向量的存储精度：float16 或 float32
+EMBEDDING_CACHE_DTYPE = os.getenv('EMBEDDING_CACHE_DTYPE', 'float16')
+# 缓存文件大小上限，超过后按最近访问时间淘汰
+EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '1024'))
+
+# 查询向量缓存：按规范化后的查询文本缓存向量，重复问题跳过向量计算
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '2048'))
+# 缓存条目的存活时间（秒），0 表示不过期
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '3600'))
+
+# 语义回答缓存：相似问题检索到相同上下文时重放已生成的回答
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '512'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', '86400'))
+# 判定为相似问题的查询向量余弦相似度阈值
+ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', '0.95'))
+
+# 混合检索：向量检索与 jieba 分词的 BM25 倒排索引按倒数排名融合（RRF）
+HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'true').lower() == 'true'
+# 每一路参与融合的候选数量
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+# 只来自倒排索引的命中没有向量距离，BM25 得分超过该值才作为上下文
+HYBRID_MIN_BM25 = float(os.getenv('HYBRID_MIN_BM25', '0'))
+LEXICAL_INDEX_DIR = os.getenv('LEXICAL_INDEX_DIR', os.path.join(DATA_FOLDER, 'lexical'))
+# 倒排段数量超过该值时合并
+LEXICAL_MAX_SEGMENTS = int(os.getenv('LEXICAL_MAX_SEGMENTS', '8'))
+# 文档频率超过该比例且超过 LEXICAL_MIN_SKIP_DF 的词在检索时跳过；查询中原样出现的词（如型号）不跳过
+LEXICAL_MAX_DF_RATIO = float(os.getenv('LEXICAL_MAX_DF_RATIO', '0.2'))
+LEXICAL_MIN_SKIP_DF = int(os.getenv('LEXICAL_MIN_SKIP_DF', '1000'))
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+
+# CrossEncoder 重排：向量检索多取候选，由重排模型一次批量打分后只保留最相关的几条
+RERANK_ENABLED = os.getenv('RERANK_ENABLED', 'false').lower() == 'true'
+RERANK_MODEL_NAME = os.getenv('RERANK_MODEL_NAME', 'BAAI/bge-reranker-base')
+# 送入重排模型的候选数量与重排后保留的上下文数量
+RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', '20'))
+RERANK_TOP_K = int(os.getenv('RERANK_TOP_K', '3'))
+# 重排得分（0~1）低于该值的上下文被丢弃
+RERANK_MIN_SCORE = float(os.getenv('RERANK_MIN_SCORE', '0.1'))
+RERANK_BATCH_SIZE = int(os.getenv('RERANK_BATCH_SIZE', '32'))
+# 按 (查询, 分块) 缓存的重排得分数量
+RERANK_CACHE_SIZE = int(os.getenv('RERANK_CACHE_SIZE', '20000'))
+
+# 批量查询：单次请求的查询数上限与并发生成回答的数量
+BATCH_QUERY_MAX_SIZE = int(os.getenv('BATCH_QUERY_MAX_SIZE', '256'))
+BATCH_ANSWER_CONCURRENCY = int(os.getenv('BATCH_ANSWER_CONCURRENCY', '4'))
+
+# 文档登记表：记录已导入文档的来源、页数、分块数和内容哈希
+DOCUMENT_REGISTRY_PATH = os.getenv('DOCUMENT_REGISTRY_PATH', os.path.join(DATA_FOLDER, 'documents.db'))
+# 分块存储：分块文本和来源信息按主键保存在 SQLite 中，向量集合只保存主键和向量
+CHUNK_STORE_PATH = os.getenv('CHUNK_STORE_PATH', os.path.join(DATA_FOLDER, 'chunks.db'))
+# 装入提示词前为每个上下文补充同一文档中前后各若干个相邻分块，0 表示不扩展
+CONTEXT_NEIGHBOR_WINDOW = int(os.getenv('CONTEXT_NEIGHBOR_WINDOW', '0'))
+# 删除文档后延迟触发 Milvus 压缩的秒数，期间的多次删除合并为一次压缩
+COMPACTION_DELAY = float(os.getenv('COMPACTION_DELAY', '300'))
+
+# 启动时在后台预热的服务，其余服务在首次使用时初始化
+WARMUP_SERVICES = [name.strip() for name in os.getenv('WARMUP_SERVICES', 'rag,agent,chat,speech').split(',') if name.strip()]
+
 # Qwen API 配置
 QWEN_API_URL = os.getenv('QWEN_API_URL', 'http://127.0.0.1:11434/api/chat')
 QWEN_MODEL = os.getenv('QWEN_MODEL', 'qwen2.5:7b')
+# Qwen 分词器（Hugging Face 名称或本地目录），用于计算提示词 token 数，加载失败时按字符数估算
+QWEN_TOKENIZER_NAME = os.getenv('QWEN_TOKENIZER_NAME', 'Qwen/Qwen2.5-7B-Instruct')
+# RAG 提示词中上下文的 token 预算，按相关性从高到低装入；预填充耗时与提示词长度成正比
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv('PROMPT_CONTEXT_TOKEN_BUDGET', '1536'))
+# 与已装入的上下文字符 n-gram 重合比例达到该值时视为重复，1 表示只去除内容相同的上下文
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv('CONTEXT_DEDUP_THRESHOLD', '0.8'))
+
+# 大模型调用路由：rag（文档问答）、chat（对话）、intent（意图识别）、summarize（语音总结）
+LLM_ROUTES = ['rag', 'chat', 'intent', 'summarize']
+# Ollama 模型常驻时间（keep_alive），-1 表示一直保留；可用 LLM_KEEP_ALIVE_<路由> 单独配置
+LLM_KEEP_ALIVE = os.getenv('LLM_KEEP_ALIVE', '30m')
+LLM_ROUTE_KEEP_ALIVE = {route: os.getenv(f'LLM_KEEP_ALIVE_{route.upper()}', LLM_KEEP_ALIVE) for route in LLM_ROUTES}
+# 上下文长度，所有路由必须一致，否则 Ollama 会按新的长度重新加载模型
+LLM_NUM_CTX = int(os.getenv('LLM_NUM_CTX', '4096'))
+# 启动时预加载模型并预填充 system 前缀的路由，为空表示不预加载
+LLM_PRELOAD_ROUTES = [name.strip() for name in os.getenv('LLM_PRELOAD_ROUTES', 'rag,intent').split(',') if name.strip()]
+# 大模型 HTTP 连接池大小，默认覆盖对话、问答的并发请求和批量问答的并发生成
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '0')) or max(8, BATCH_ANSWER_CONCURRENCY * 2)
+# 建立连接的超时秒数
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+# 各路由等待响应（流式请求为相邻两次数据之间）的超时秒数，可用 LLM_TIMEOUT_<路由> 单独配置
+_LLM_DEFAULT_TIMEOUTS = {'rag': 120, 'chat': 60, 'intent': 30, 'summarize': 120}
+LLM_ROUTE_TIMEOUT = {route: float(os.getenv(f'LLM_TIMEOUT_{route.upper()}', str(_LLM_DEFAULT_TIMEOUTS[route])))
+                     for route in LLM_ROUTES}
+# 连接失败或返回 502/503/504 时的重试次数与退避基数（秒），可用 LLM_RETRIES_<路由> 单独配置
+LLM_RETRIES = int(os.getenv('LLM_RETRIES', '2'))
+LLM_ROUTE_RETRIES = {route: int(os.getenv(f'LLM_RETRIES_{route.upper()}', str(LLM_RETRIES))) for route in LLM_ROUTES}
+LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', '0.5'))
 
 # FunASR 配置
 FUNASR_API_URL = os.getenv('FUNASR_API_URL', 'http://127.0.0.1:10096')
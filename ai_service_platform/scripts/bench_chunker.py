@@ -0,0 +1,91 @@
+"""文本分块微基准
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.bench_chunker [--text FILE | --pdf FILE] [--size-mb 20] [--tokenizer]
+
+对比旧的字符串拼接分块实现与 TextChunker 的吞吐（MB/秒），
+加 --tokenizer 时同时测试按向量模型 token 计数的模式。
+"""
+import re
+import time
+import argparse
+from typing import List
+from services.text_chunker import TextChunker
+
+SAMPLE_PARAGRAPH = (
+    '为规范公司差旅管理，提高资金使用效率，根据国家有关规定，结合公司实际情况，制定本办法。'
+    '出差人员应当严格按照审批的行程执行，不得擅自变更出差地点和延长出差时间！'
+    '因特殊情况需要变更的，应当事先报请审批人同意？'
+    '住宿费在标准限额内凭发票据实报销，超出部分由个人承担。'
+    '设备型号 XJ-2000 的额定功率为 1.5 千瓦，使用前请阅读安全说明。\n'
+)
+
+
+def legacy_split(text: str, max_length: int = 500) -> List[str]:
+    """旧实现：逐句拼接字符串并按字符数切分"""
+    sentences = re.split(r'([。！？!?])', text)
+    chunks = []
+    current_chunk = ""
+    i = 0
+    while i < len(sentences):
+        sent = sentences[i] + (sentences[i + 1] if i + 1 < len(sentences) else '')
+        i += 2
+        if len(current_chunk) + len(sent) > max_length and current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = ""
+        current_chunk += sent
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def load_corpus(args) -> str:
+    if args.text:
+        with open(args.text, 'r', encoding='utf-8') as f:
+            text = f.read()
+    elif args.pdf:
+        from services.pdf_extractor import extract_pages
+        text = '\n'.join(page_text for _, page_text in extract_pages(args.pdf))
+    else:
+        text = SAMPLE_PARAGRAPH
+    # 重复到指定大小
+    target = int(args.size_mb * 1024 * 1024)
+    size = len(text.encode('utf-8'))
+    return text * max(1, target // max(1, size))
+
+
+def bench(name: str, corpus: str, split) -> None:
+    size_mb = len(corpus.encode('utf-8')) / 1024 / 1024
+    start = time.perf_counter()
+    chunks = split(corpus)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24}{len(chunks):>10}{elapsed:>10.2f}{size_mb / elapsed:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文本分块微基准')
+    parser.add_argument('--text', help='语料文本文件')
+    parser.add_argument('--pdf', help='从 PDF 中提取语料')
+    parser.add_argument('--size-mb', type=float, default=20, help='语料大小（MB）')
+    parser.add_argument('--max-length', type=int, default=500)
+    parser.add_argument('--overlap', type=int, default=0)
+    parser.add_argument('--tokenizer', action='store_true', help='同时测试按 token 计数的模式')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    print(f"语料大小: {len(corpus.encode('utf-8')) / 1024 / 1024:.1f} MB")
+    print(f"{'实现':<24}{'分块数':>10}{'耗时(s)':>10}{'MB/s':>10}")
+
+    bench('legacy (char)', corpus, lambda text: legacy_split(text, args.max_length))
+    bench('TextChunker (char)', corpus, TextChunker(args.max_length, args.overlap).split)
+
+    if args.tokenizer:
+        from services.model_registry import get_embedding_service
+        embedder = get_embedding_service()
+        max_tokens = min(args.max_length, embedder.max_seq_length)
+        chunker = TextChunker(max_tokens, args.overlap, tokenizer=embedder.tokenizer)
+        bench('TextChunker (token)', corpus, chunker.split)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""比较不同推理后端的向量一致性与吞吐
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.bench_embedding [--pdf FILE | --texts FILE] [--backends torch,onnx,onnx-int8]
+
+以 torch 后端的向量为基准，输出每个后端的余弦相似度（最小值/平均值）和每秒处理文本数。
+"""
+import time
+import argparse
+import numpy as np
+from typing import List, Tuple
+from config import VECTOR_MODEL_NAME, EMBEDDING_BATCH_SIZE
+from services.model_registry import get_embedding_model
+
+SAMPLE_SENTENCES = [
+    '请假需要提前三个工作日在系统中提交申请，并由直属上级审批。',
+    '设备型号 XJ-2000 的额定功率为 1.5 千瓦，适用于单相电源。',
+    '报销单据应在费用发生后三十日内提交，逾期将不予受理。',
+    '如遇系统故障，请拨打技术支持热线或在工单系统中提交问题。',
+    '本手册适用于公司全体员工，解释权归人力资源部所有。',
+]
+
+
+def load_texts(args) -> List[str]:
+    if args.texts:
+        with open(args.texts, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+    elif args.pdf:
+        from services.pdf_extractor import extract_pages
+        texts = []
+        for _, text in extract_pages(args.pdf):
+            text = ' '.join(text.split())
+            texts.extend(text[i:i + 300] for i in range(0, len(text), 300) if text[i:i + 300].strip())
+    else:
+        texts = [f"{sentence}（第 {i} 条）" for i in range(args.count // len(SAMPLE_SENTENCES) + 1)
+                 for sentence in SAMPLE_SENTENCES]
+    return texts[:args.count]
+
+
+def run(texts: List[str], backend: str, batch_size: int) -> Tuple[np.ndarray, float]:
+    model = get_embedding_model(VECTOR_MODEL_NAME, backend)
+    # 预热，排除首次推理的初始化开销
+    model.encode(texts[:batch_size], batch_size=batch_size, normalize_embeddings=True)
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    elapsed = time.perf_counter() - start
+    return np.asarray(embeddings, dtype=np.float32), len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量推理后端一致性与吞吐对比')
+    parser.add_argument('--pdf', help='从 PDF 中提取测试文本')
+    parser.add_argument('--texts', help='测试文本文件，每行一条')
+    parser.add_argument('--count', type=int, default=512, help='测试文本数量')
+    parser.add_argument('--batch-size', type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument('--backends', default='torch,onnx,onnx-int8')
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    print(f"测试文本 {len(texts)} 条，批次大小 {args.batch_size}")
+
+    reference = None
+    print(f"{'后端':<12}{'文本/秒':>10}{'最小余弦':>10}{'平均余弦':>10}")
+    for backend in backends:
+        embeddings, throughput = run(texts, backend, args.batch_size)
+        if reference is None:
+            reference = embeddings
+        cosine = np.sum(embeddings * reference, axis=1)
+        print(f"{backend:<12}{throughput:>10.1f}{cosine.min():>10.4f}{cosine.mean():>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
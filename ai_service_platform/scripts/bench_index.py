@@ -0,0 +1,189 @@
+"""向量索引召回率/延迟评估
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.bench_index [--sample 50000] [--queries 200] [--k 5]
+                                  [--index-types IVF_FLAT,IVF_SQ8,HNSW] [--target-recall 0.95] [--apply]
+
+从当前集合均匀抽样向量，留出一部分作为查询，以暴力搜索结果为基准，在临时集合上
+对每种索引类型扫描搜索参数，输出 recall@k 与单条查询的 p50/p99 延迟，并按当前
+集合规模推荐索引设置。加 --apply 时，若推荐的索引类型与集合当前索引一致，
+把搜索参数写入索引设置文件，重启服务后生效。
+"""
+import math
+import time
+import argparse
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+from config import COLLECTION_NAME
+from services.model_registry import connect_milvus
+from services.collection_manager import (
+    build_index_params, build_search_params, get_index_type, save_index_settings
+)
+
+BENCH_COLLECTION = f"{COLLECTION_NAME}_bench"
+NPROBE_SWEEP = [1, 4, 8, 16, 32, 64, 128, 256]
+EF_SWEEP = [16, 32, 64, 128, 256, 512]
+
+
+def recommend_nlist(row_count: int) -> int:
+    """IVF 聚类数取 4 * sqrt(行数) 附近的 2 的幂"""
+    target = 4 * math.sqrt(max(row_count, 1))
+    return int(min(65536, max(16, 2 ** round(math.log2(target)))))
+
+
+def sample_vectors(collection: Collection, limit: int, rng: np.random.Generator) -> np.ndarray:
+    """遍历集合做蓄水池抽样，样本均匀分布在全部记录中，而不是只取主键最小（最早导入）的记录"""
+    collection.load()
+    iterator = collection.query_iterator(batch_size=1000, expr="id >= 0", output_fields=['embedding'])
+    reservoir = []
+    seen = 0
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            for row in batch:
+                seen += 1
+                if len(reservoir) < limit:
+                    reservoir.append(row['embedding'])
+                else:
+                    slot = rng.integers(seen)
+                    if slot < limit:
+                        reservoir[slot] = row['embedding']
+    finally:
+        iterator.close()
+    return np.asarray(reservoir, dtype=np.float32)
+
+
+def brute_force(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """L2 暴力搜索，返回每个查询最近的 k 个基准向量下标"""
+    base_norms = np.sum(base ** 2, axis=1)
+    neighbors = []
+    for start in range(0, len(queries), 64):
+        batch = queries[start:start + 64]
+        distances = base_norms[None, :] - 2 * batch @ base.T
+        top = np.argpartition(distances, k, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        neighbors.append(np.take_along_axis(top, order, axis=1))
+    return np.vstack(neighbors)
+
+
+def create_bench_collection(base: np.ndarray) -> Collection:
+    if utility.has_collection(BENCH_COLLECTION):
+        utility.drop_collection(BENCH_COLLECTION)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ], description='index benchmark')
+    collection = Collection(BENCH_COLLECTION, schema=schema)
+    for start in range(0, len(base), 5000):
+        end = min(start + 5000, len(base))
+        collection.insert([list(range(start, end)), base[start:end].tolist()])
+    collection.flush()
+    return collection
+
+
+def sweep_params(index_type: str, nlist: int) -> List[Dict[str, Any]]:
+    if index_type == 'HNSW':
+        return [{'ef': ef} for ef in EF_SWEEP]
+    if index_type == 'FLAT':
+        return [{}]
+    return [{'nprobe': nprobe} for nprobe in NPROBE_SWEEP if nprobe <= nlist]
+
+
+def measure(collection: Collection, index_type: str, params: Dict[str, Any], queries: np.ndarray,
+            truth: np.ndarray, k: int) -> Tuple[float, float, float]:
+    """逐条查询，返回 recall@k、p50 与 p99 延迟（毫秒）"""
+    search_params = build_search_params(index_type, params)
+    latencies = []
+    found = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = collection.search(data=[query.tolist()], anns_field='embedding',
+                                    param=search_params, limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(set(hit.id for hit in results[0]) & set(expected.tolist()))
+    return found / truth.size, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量索引召回率/延迟评估')
+    parser.add_argument('--sample', type=int, default=50000, help='从集合中抽样的向量数')
+    parser.add_argument('--queries', type=int, default=200, help='留出作为查询的向量数')
+    parser.add_argument('--k', type=int, default=5, help='recall@k 的 k')
+    parser.add_argument('--index-types', default='IVF_FLAT,IVF_SQ8,HNSW')
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--apply', action='store_true', help='把推荐的搜索参数写入索引设置文件')
+    args = parser.parse_args()
+
+    connect_milvus()
+    collection = Collection(COLLECTION_NAME)
+    row_count = collection.num_entities
+    current_index = get_index_type(collection)
+    print(f"集合 {COLLECTION_NAME}: {row_count} 条记录，当前索引 {current_index}")
+
+    rng = np.random.default_rng(0)
+    vectors = sample_vectors(collection, args.sample + args.queries, rng)
+    if len(vectors) <= args.queries + args.k:
+        print("集合中的数据太少，无法评估")
+        return
+    rng.shuffle(vectors)
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    truth = brute_force(base, queries, args.k)
+    sample_nlist = recommend_nlist(len(base))
+    print(f"基准向量 {len(base)} 条，查询 {len(queries)} 条，抽样规模下 nlist={sample_nlist}")
+
+    bench = create_bench_collection(base)
+    results = []
+    try:
+        print(f"{'索引':<10}{'参数':<18}{'recall':>8}{'p50(ms)':>10}{'p99(ms)':>10}")
+        for index_type in [name.strip() for name in args.index_types.split(',') if name.strip()]:
+            overrides = {'nlist': sample_nlist} if index_type.startswith('IVF') else None
+            if bench.has_index():
+                bench.release()
+                bench.drop_index()
+            bench.create_index('embedding', build_index_params(index_type, base.shape[1], overrides))
+            bench.load()
+            for params in sweep_params(index_type, sample_nlist):
+                recall, p50, p99 = measure(bench, index_type, params, queries, truth, args.k)
+                results.append({'index_type': index_type, 'params': params, 'recall': recall, 'p50': p50, 'p99': p99})
+                label = ', '.join(f"{key}={value}" for key, value in params.items()) or '-'
+                print(f"{index_type:<10}{label:<18}{recall:>8.3f}{p50:>10.2f}{p99:>10.2f}")
+    finally:
+        utility.drop_collection(BENCH_COLLECTION)
+
+    qualified = [item for item in results if item['recall'] >= args.target_recall]
+    best = min(qualified, key=lambda item: item['p99']) if qualified else max(results, key=lambda item: item['recall'])
+    if not qualified:
+        print(f"没有设置达到目标召回率 {args.target_recall}，以下为召回率最高的设置")
+
+    # IVF 的 nprobe 按 nlist 的比例换算到整个集合的规模
+    params = dict(best['params'])
+    nlist = recommend_nlist(row_count)
+    if 'nprobe' in params:
+        params['nprobe'] = max(1, min(nlist, round(params['nprobe'] * nlist / sample_nlist)))
+
+    print(f"\n推荐设置（集合规模 {row_count} 条，recall@{args.k}={best['recall']:.3f}，p99={best['p99']:.2f} ms）:")
+    print(f"  VECTOR_INDEX_TYPE={best['index_type']}")
+    if best['index_type'].startswith('IVF'):
+        print(f"  VECTOR_INDEX_NLIST={nlist}")
+    for key, value in params.items():
+        print(f"  VECTOR_SEARCH_{key.upper()}={value}")
+
+    if args.apply:
+        if best['index_type'] == current_index:
+            if 'nprobe' in params:
+                # 按集合实际的 nlist 换算
+                current_nlist = next((index.params.get('params', {}).get('nlist') for index in collection.indexes
+                                      if index.field_name == 'embedding'), None) or nlist
+                params['nprobe'] = max(1, min(current_nlist,
+                                              round(best['params']['nprobe'] * current_nlist / sample_nlist)))
+            save_index_settings({'index_type': current_index, 'search_params': params})
+            print("搜索参数已写入索引设置文件，重启服务后生效")
+        else:
+            print(f"推荐的索引类型与当前索引 {current_index} 不同，需要修改配置后重建集合，未写入设置")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""从分块存储重建 BM25 倒排索引
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.build_lexical_index [--batch-size 1000] [--segment-size 50000]
+
+启用混合检索前导入的文档没有倒排记录，运行一次即可补齐。重建期间请停止导入任务。
+分块文本从分块存储（CHUNK_STORE_PATH）中读取，主键与向量存储一致。
+"""
+import time
+import argparse
+from services.chunk_store import ChunkStore
+from services.lexical_index import LexicalIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从分块存储重建 BM25 倒排索引')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每次从分块存储读取的记录数')
+    parser.add_argument('--segment-size', type=int, default=50000, help='每个倒排段包含的分块数')
+    args = parser.parse_args()
+
+    store = ChunkStore()
+    index = LexicalIndex()
+    index.reset()
+
+    start = time.perf_counter()
+    total = 0
+    pending = 0
+    for batch in store.iter_rows(args.batch_size):
+        index.add([row['id'] for row in batch], batch)
+        total += len(batch)
+        pending += len(batch)
+        if pending >= args.segment_size:
+            index.commit()
+            pending = 0
+            print(f"已处理 {total} 条记录")
+    index.commit()
+
+    print(f"倒排索引重建完成: {total} 条记录，耗时 {time.perf_counter() - start:.1f} 秒，{index.stats()}")
+
+
+if __name__ == '__main__':
+    main()
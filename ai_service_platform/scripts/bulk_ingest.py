@@ -0,0 +1,32 @@
+"""批量导入 PDF 到知识库
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.bulk_ingest PATH [--workers 2]
+
+PATH 可以是 zip/tar 压缩包、包含 PDF 的目录，或每行一个 PDF 路径的清单文件。
+"""
+import time
+import argparse
+from config import BULK_INGEST_WORKERS
+from services.bulk_ingest import iter_documents
+from services.rag_service import RAGService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入 PDF 到知识库')
+    parser.add_argument('path', help='压缩包、目录或清单文件')
+    parser.add_argument('--workers', type=int, default=BULK_INGEST_WORKERS, help='并行处理的文档数')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = RAGService().ingest_documents(iter_documents(args.path), workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    for item in result['failed']:
+        print(f"失败: {item['source']}: {item['message']}")
+    print(f"文档 {result['files']} 个，成功 {len(result['succeeded'])} 个，"
+          f"写入 {result['chunks']} 条记录，耗时 {elapsed:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
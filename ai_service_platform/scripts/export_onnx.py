@@ -0,0 +1,73 @@
+"""导出向量模型为 ONNX，并生成 int8 动态量化版本
+
+用法（在 ai_service_platform 目录下）：
+    python -m scripts.export_onnx [--model NAME] [--output DIR] [--no-quantize]
+"""
+import os
+import json
+import argparse
+from config import VECTOR_MODEL_NAME, ONNX_MODEL_DIR
+from services.onnx_embedding import ONNX_MODEL_FILE, ONNX_INT8_MODEL_FILE, ONNX_CONFIG_FILE
+
+
+def _pooling_mode(model) -> str:
+    """读取 SentenceTransformer 的池化方式"""
+    for module in model:
+        if hasattr(module, 'get_config_dict') and 'pooling_mode_cls_token' in module.get_config_dict():
+            return 'cls' if module.get_config_dict()['pooling_mode_cls_token'] else 'mean'
+    return 'mean'
+
+
+def export(model_name: str, output_dir: str, quantize: bool = True):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(['导出示例文本'], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    print(f"导出 ONNX 模型到: {model_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        'model_name': model_name,
+        'max_seq_length': model.max_seq_length,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'pooling': _pooling_mode(model)
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        int8_path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+        print(f"生成 int8 动态量化模型: {int8_path}")
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+
+    print("导出完成，可运行 python -m scripts.bench_embedding 检查一致性与吞吐")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='导出向量模型为 ONNX')
+    parser.add_argument('--model', default=VECTOR_MODEL_NAME, help='SentenceTransformer 模型名称或路径')
+    parser.add_argument('--output', default=ONNX_MODEL_DIR, help='输出目录')
+    parser.add_argument('--no-quantize', action='store_true', help='不生成 int8 量化模型')
+    args = parser.parse_args()
+    export(args.model, args.output, quantize=not args.no_quantize)
@@ -1,11 +1,14 @@
 import json
 import os
 from typing import Dict, List, Optional, Generator, Any
-import requests
-from config import QWEN_API_URL, QWEN_MODEL
+from services.prompt_templates import build_messages
+from services.llm_client import get_llm_client, streaming
 
 class AgentService:
-    def __init__(self):
+    def __init__(self, rag_service=None):
+        # 共享的 RAG 服务，避免每次检索都重新初始化
+        self.rag_service = rag_service
+        self.client = get_llm_client()
         self.agents_dir = 'data/agents'
         os.makedirs(self.agents_dir, exist_ok=True)
         self._load_agents()
@@ -77,25 +80,11 @@ class AgentService:
         return list(self.agents.values())
 
     def get_intent(self, message: str) -> str:
-        """使用 Qwen 识别用户意图"""
-        system_prompt = """你是一个意图识别专家。你需要分析用户的输入，并从以下选项中选择最匹配的意图：
-            1. CHAT - 普通聊天对话
-            2. QUERY - 文档检索查询
-            3. AGENT - 需要特定 Agent 处理
-            请只返回意图代码（CHAT/QUERY/AGENT），不要包含其他内容。"""
-
+        """使用 Qwen 识别用户意图，识别指令在固定的 system 前缀中"""
         try:
-            response = requests.post(
-                QWEN_API_URL,
-                json={
-                    "model": QWEN_MODEL,
-                    "prompt": f"{system_prompt}\n\n用户输入: {message}\n\n意图:",
-                    "stream": False
-                }
-            )
-            response.raise_for_status()
+            response = self.client.chat('intent', build_messages('intent', f"用户输入: {message}"), stream=False)
             result = response.json()
-            intent = result['response'].strip().upper()
+            intent = result.get('message', {}).get('content', '').strip().upper()
             print(f"识别到的意图: {intent}")
             return intent if intent in ['CHAT', 'QUERY', 'AGENT'] else 'CHAT'
         except Exception as e:
@@ -105,9 +94,10 @@ class AgentService:
     def handle_rag_query(self, message: str) -> Generator[str, None, None]:
         """处理文档检索查询"""
         try:
-            from services.rag_service import RAGService
-            rag_service = RAGService()
-            result = rag_service.query(message)
+            if self.rag_service is None:
+                from services.service_registry import get_service
+                self.rag_service = get_service('rag')
+            result = self.rag_service.query(message)
             
             # 首先发送文档来源
             yield json.dumps({
@@ -155,30 +145,23 @@ class AgentService:
         """处理普通聊天"""
         try:
             print(f"使用 Qwen 处理消息: {message}")
-            response = requests.post(
-                QWEN_API_URL,
-                json={
-                    "model": QWEN_MODEL,
-                    "prompt": message,
-                    "stream": True
-                },
-                stream=True
-            )
-            response.raise_for_status()
-            
-            # 处理流式响应
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        result = json.loads(line.decode())
-                        if 'response' in result:
-                            yield json.dumps({
-                                'type': 'message',
-                                'content': result['response']
-                            })
-                    except json.JSONDecodeError as e:
-                        print(f"解析响应失败: {str(e)}")
-                        continue
+            with streaming(self.client.chat('chat', build_messages('chat', message), stream=True)) as response:
+                # 处理流式响应（/api/chat 的增量内容在 message.content 中）
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            result = json.loads(line.decode())
+                            if result.get('done', False):
+                                break
+                            content = result.get('message', {}).get('content', '')
+                            if content:
+                                yield json.dumps({
+                                    'type': 'message',
+                                    'content': content
+                                })
+                        except json.JSONDecodeError as e:
+                            print(f"解析响应失败: {str(e)}")
+                            continue
                         
         except Exception as e:
             print(f"聊天处理失败: {str(e)}")
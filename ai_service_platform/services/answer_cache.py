@@ -0,0 +1,85 @@
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+from config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY
+from services.corpus_state import corpus_version
+
+
+class SemanticAnswerCache:
+    """语义回答缓存
+
+    新问题的查询向量与某个已缓存问题的余弦相似度达到阈值，并且检索到的
+    上下文完全相同时，直接重放缓存的流式回答，跳过大模型生成。
+    知识库版本变化后所有条目失效。查询向量需要已归一化。
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.similarity = similarity
+        self.entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self.next_id = 0
+        self.version = corpus_version()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self):
+        """丢弃知识库版本变化前和超过存活时间的条目，需持有锁"""
+        version = corpus_version()
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+        if self.ttl:
+            now = time.monotonic()
+            for entry_id in [entry_id for entry_id, entry in self.entries.items() if entry['expires_at'] <= now]:
+                del self.entries[entry_id]
+
+    def get(self, query_vector: np.ndarray, context_ids: Sequence[Any]) -> Optional[List[str]]:
+        """查找可重放的回答
+        Returns:
+            缓存的回答事件列表，未命中时为 None
+        """
+        key = tuple(sorted(context_ids))
+        with self.lock:
+            self._expire()
+            candidates = [(entry_id, entry) for entry_id, entry in self.entries.items() if entry['context_ids'] == key]
+            if candidates:
+                vectors = np.stack([entry['vector'] for _, entry in candidates])
+                scores = vectors @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    entry_id, entry = candidates[best]
+                    self.entries.move_to_end(entry_id)
+                    self.hits += 1
+                    print(f"语义缓存命中，相似度 {scores[best]:.4f}")
+                    return entry['events']
+            self.misses += 1
+            return None
+
+    def put(self, query_vector: np.ndarray, context_ids: Sequence[Any], events: List[str]):
+        with self.lock:
+            self._expire()
+            self.entries[self.next_id] = {
+                'vector': np.asarray(query_vector, dtype=np.float32),
+                'context_ids': tuple(sorted(context_ids)),
+                'events': list(events),
+                'expires_at': time.monotonic() + self.ttl if self.ttl else float('inf')
+            }
+            self.next_id += 1
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
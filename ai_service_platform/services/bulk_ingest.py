@@ -0,0 +1,107 @@
+import os
+import posixpath
+import tarfile
+import zipfile
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+# 批量导入的文档：(文档名称, 文件路径或文件内容)
+# 文档名称为文件在压缩包、目录或清单中的相对路径，不同文件夹中的同名文件不会冲突
+Document = Tuple[str, Union[str, bytes]]
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith('.pdf')
+
+
+def _source_name(name: str) -> str:
+    """相对路径转换为文档名称：统一以 / 分隔，去掉开头的 ./ 和 /"""
+    return posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+
+
+def iter_zip(path: str) -> Iterator[Document]:
+    """逐个读取 zip 中的 PDF 成员，不解压到磁盘"""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_pdf(info.filename):
+                continue
+            with archive.open(info) as member:
+                yield _source_name(info.filename), member.read()
+
+
+def iter_tar(path: str) -> Iterator[Document]:
+    """以流模式逐个读取 tar/tar.gz 中的 PDF 成员，不解压到磁盘"""
+    with tarfile.open(path, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not _is_pdf(member.name):
+                continue
+            fileobj = archive.extractfile(member)
+            if fileobj is not None:
+                yield _source_name(member.name), fileobj.read()
+
+
+def iter_directory(path: str) -> Iterator[Document]:
+    """递归列出目录中的 PDF 文件"""
+    for root, _, files in os.walk(path):
+        for filename in sorted(files):
+            if _is_pdf(filename):
+                file_path = os.path.join(root, filename)
+                yield _source_name(os.path.relpath(file_path, path)), file_path
+
+
+def iter_manifest(path: str) -> Iterator[Document]:
+    """读取清单文件，每行一个 PDF 路径，相对路径以清单所在目录为基准"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            file_path = line.strip()
+            if not file_path or file_path.startswith('#'):
+                continue
+            file_path = os.path.join(base_dir, file_path)
+            if _is_pdf(file_path):
+                yield _source_name(os.path.relpath(file_path, base_dir)), file_path
+
+
+def iter_documents(path: str) -> Iterator[Document]:
+    """根据路径类型（目录、zip、tar、清单文件）列出待导入的文档"""
+    if os.path.isdir(path):
+        return iter_directory(path)
+    if zipfile.is_zipfile(path):
+        return iter_zip(path)
+    if tarfile.is_tarfile(path):
+        return iter_tar(path)
+    return iter_manifest(path)
+
+
+class BatchInserter:
+    """跨文档合并写入的批量插入器
+
+    多个导入线程共享同一个实例，记录累积到批次大小后统一写入，
+    减少小批量插入的次数。
+    """
+
+    def __init__(self, insert: Callable[[List[Dict[str, Any]]], Any], batch_size: int):
+        self.insert = insert
+        self.batch_size = max(1, batch_size)
+        self.buffer: List[Dict[str, Any]] = []
+        self.rows_inserted = 0
+        self.lock = threading.Lock()
+
+    def add(self, rows: List[Dict[str, Any]]):
+        with self.lock:
+            self.buffer.extend(rows)
+            while len(self.buffer) >= self.batch_size:
+                batch = self.buffer[:self.batch_size]
+                self.buffer = self.buffer[self.batch_size:]
+                self.insert(batch)
+                self.rows_inserted += len(batch)
+                print(f"批量写入 {len(batch)} 条记录，累计 {self.rows_inserted} 条")
+
+    def close(self) -> int:
+        """写入剩余记录，返回累计写入数量"""
+        with self.lock:
+            if self.buffer:
+                self.insert(self.buffer)
+                self.rows_inserted += len(self.buffer)
+                self.buffer = []
+            return self.rows_inserted
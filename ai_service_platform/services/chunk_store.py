@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from config import CHUNK_STORE_PATH
+
+# 分块记录中除主键以外的字段
+CHUNK_FIELDS = ['content', 'source', 'page', 'chunk', 'total_pages']
+
+# SQLite 单条语句的参数数量上限
+_SQL_BATCH = 500
+
+
+def _to_dict(row: tuple) -> Dict[str, Any]:
+    return {'id': row[0], **dict(zip(CHUNK_FIELDS, row[1:]))}
+
+
+class ChunkStore:
+    """分块文本与来源信息的存储，按分块主键索引
+
+    向量存储只保存主键和向量，检索得到主键后从这里读取文本和来源信息。
+    (source, page, chunk) 上有联合索引，按来源删除和读取相邻分块都只需一次索引查找。
+    主键在写入时分配并单调递增，已分配的最大主键记录在 chunk_meta 表中，删除最新的
+    文档后主键也不会被重新使用；多个进程写入时由 SQLite 的写锁保证不重复。
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'id INTEGER PRIMARY KEY, content TEXT NOT NULL, source TEXT NOT NULL, '
+            'page INTEGER NOT NULL, chunk INTEGER NOT NULL, total_pages INTEGER NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_position ON chunks (source, page, chunk)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS chunk_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    @staticmethod
+    def _record(row: Dict[str, Any]) -> tuple:
+        return (row['content'], row.get('source', ''), row.get('page', 0), row.get('chunk', 0),
+                row.get('total_pages', 0))
+
+    def _reserve_ids(self, count: int) -> int:
+        """分配 count 个新主键，返回起始主键，需在写事务中调用"""
+        row = self.conn.execute("SELECT value FROM chunk_meta WHERE key = 'next_id'").fetchone()
+        start = max(row[0] if row else 1,
+                    self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM chunks').fetchone()[0])
+        self._advance_next_id(start + count)
+        return start
+
+    def _advance_next_id(self, next_id: int):
+        self.conn.execute(
+            "INSERT INTO chunk_meta (key, value) VALUES ('next_id', ?) "
+            'ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)', (next_id,)
+        )
+
+    def add(self, rows: Sequence[Dict[str, Any]]) -> List[int]:
+        """写入分块并分配主键，返回与记录一一对应的主键"""
+        if not rows:
+            return []
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                start = self._reserve_ids(len(rows))
+                ids = list(range(start, start + len(rows)))
+                self.conn.executemany(
+                    f"INSERT INTO chunks (id, {', '.join(CHUNK_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(chunk_id, *self._record(row)) for chunk_id, row in zip(ids, rows)]
+                )
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return ids
+
+    def put(self, rows: Sequence[Dict[str, Any]]):
+        """按记录中已有的主键写入，用于迁移旧集合的数据"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO chunks (id, {', '.join(CHUNK_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(int(row['id']), *self._record(row)) for row in rows]
+                )
+                if rows:
+                    self._advance_next_id(max(int(row['id']) for row in rows) + 1)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def get_many(self, chunk_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """批量读取分块，不存在的主键不出现在结果中"""
+        found = {}
+        chunk_ids = list(chunk_ids)
+        with self.lock:
+            for i in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[i:i + _SQL_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                for row in self.conn.execute(
+                    f"SELECT id, {', '.join(CHUNK_FIELDS)} FROM chunks WHERE id IN ({placeholders})", batch
+                ):
+                    found[row[0]] = dict(zip(CHUNK_FIELDS, row[1:]))
+        return found
+
+    def neighbors(self, source: str, page: int, chunk: int, window: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+        """读取同一文档中位于 (page, chunk) 前后各 window 个分块，可跨页
+        Returns:
+            {'before': 按位置正序排列的前文分块, 'after': 后文分块}
+        """
+        columns = f"id, {', '.join(CHUNK_FIELDS)}"
+        with self.lock:
+            before = self.conn.execute(
+                f"SELECT {columns} FROM chunks WHERE source = ? AND (page, chunk) < (?, ?) "
+                'ORDER BY page DESC, chunk DESC LIMIT ?', (source, page, chunk, window)
+            ).fetchall()
+            after = self.conn.execute(
+                f"SELECT {columns} FROM chunks WHERE source = ? AND (page, chunk) > (?, ?) "
+                'ORDER BY page, chunk LIMIT ?', (source, page, chunk, window)
+            ).fetchall()
+        return {'before': [_to_dict(row) for row in reversed(before)], 'after': [_to_dict(row) for row in after]}
+
+    def source_ids(self, source: str) -> List[int]:
+        """某个来源的全部分块主键"""
+        with self.lock:
+            return [chunk_id for (chunk_id,) in
+                    self.conn.execute('SELECT id FROM chunks WHERE source = ?', (source,))]
+
+    def delete(self, chunk_ids: Sequence[int]):
+        """按主键删除分块，已分配的主键不会被重新使用"""
+        chunk_ids = list(chunk_ids)
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for i in range(0, len(chunk_ids), _SQL_BATCH):
+                    batch = chunk_ids[i:i + _SQL_BATCH]
+                    self.conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """按主键顺序分批遍历全部分块"""
+        last_id = 0
+        while True:
+            with self.lock:
+                batch = self.conn.execute(
+                    f"SELECT id, {', '.join(CHUNK_FIELDS)} FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            yield [_to_dict(row) for row in batch]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+
+_shared_store: Optional[ChunkStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """获取进程内共享的分块存储"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = ChunkStore()
+        return _shared_store
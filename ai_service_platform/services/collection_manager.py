@@ -0,0 +1,287 @@
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from pymilvus import Collection, FieldSchema, CollectionSchema, DataType, utility
+from config import (
+    COLLECTION_NAME, VECTOR_DIM, VECTOR_INDEX_TYPE, VECTOR_INDEX_NLIST,
+    VECTOR_PQ_M, VECTOR_PQ_NBITS, VECTOR_HNSW_M, VECTOR_HNSW_EF_CONSTRUCTION,
+    VECTOR_SEARCH_NPROBE, VECTOR_SEARCH_EF, INDEX_SETTINGS_PATH, COMPACTION_DELAY
+)
+
+# 当前集合结构版本，修改字段或索引时递增，并在 MIGRATIONS 中补充升级函数
+SCHEMA_VERSION = 2
+
+# 迁移时每批复制的记录数
+MIGRATION_BATCH_SIZE = 1000
+
+# 各版本必需的字段，用于识别没有版本记录的旧集合
+VERSION_FIELDS = {
+    2: {'id', 'embedding'},
+    1: {'id', 'content', 'embedding', 'source', 'page', 'chunk', 'total_pages'},
+    0: {'id', 'content', 'embedding'},
+}
+
+
+def _upgrade_v0(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """v0 -> v1：补充来源与页码字段"""
+    for row in rows:
+        row.setdefault('source', '')
+        row.setdefault('page', 0)
+        row.setdefault('chunk', 0)
+        row.setdefault('total_pages', 0)
+    return rows
+
+
+def _upgrade_v1(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """v1 -> v2：文本和来源信息移到分块存储，集合只保留主键和向量
+
+    主键保持不变，词法索引中记录的分块主键无需重建。
+    """
+    from services.chunk_store import get_chunk_store
+    get_chunk_store().put(rows)
+    return [{'id': row['id'], 'embedding': row['embedding']} for row in rows]
+
+
+# 版本 N 的一批记录升级到 N + 1 的函数
+MIGRATIONS: Dict[int, Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = {
+    0: _upgrade_v0,
+    1: _upgrade_v1,
+}
+
+
+def physical_name(version: int) -> str:
+    """带版本号的实际集合名称，对外统一通过别名 COLLECTION_NAME 访问"""
+    return f"{COLLECTION_NAME}_v{version}"
+
+
+def build_schema(dim: int) -> CollectionSchema:
+    # 主键由分块存储分配，文本和来源信息不进入集合
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim)
+    ]
+    # 结构版本记录在集合描述中，随集合一起持久化
+    description = json.dumps({'schema_version': SCHEMA_VERSION, 'dim': dim})
+    return CollectionSchema(fields=fields, description=description, enable_dynamic_field=True)
+
+
+def read_schema_version(collection: Collection) -> int:
+    """读取集合的结构版本，旧集合根据字段推断"""
+    try:
+        record = json.loads(collection.description)
+        if isinstance(record, dict) and 'schema_version' in record:
+            return int(record['schema_version'])
+    except (TypeError, ValueError):
+        pass
+
+    existing_fields = {field.name for field in collection.schema.fields}
+    for version, fields in VERSION_FIELDS.items():
+        if fields == existing_fields:
+            return version
+    for version in sorted(VERSION_FIELDS, reverse=True):
+        if VERSION_FIELDS[version].issubset(existing_fields):
+            return version
+    return 0
+
+
+def build_index_params(index_type: str = VECTOR_INDEX_TYPE, dim: int = VECTOR_DIM,
+                       overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """根据配置生成向量索引参数，overrides 覆盖默认的构建参数"""
+    if index_type == 'FLAT':
+        params = {}
+    elif index_type == 'HNSW':
+        params = {"M": VECTOR_HNSW_M, "efConstruction": VECTOR_HNSW_EF_CONSTRUCTION}
+    elif index_type in ('IVF_FLAT', 'IVF_SQ8', 'IVF_PQ'):
+        params = {"nlist": VECTOR_INDEX_NLIST}
+        if index_type == 'IVF_PQ':
+            params.update({"m": VECTOR_PQ_M, "nbits": VECTOR_PQ_NBITS})
+    else:
+        raise ValueError(f"不支持的索引类型: {index_type}")
+    params.update(overrides or {})
+    if index_type == 'IVF_PQ' and dim % params['m'] != 0:
+        raise ValueError(f"IVF_PQ 子空间数量 m={params['m']} 不能整除向量维度 {dim}")
+    return {
+        "metric_type": "L2",  # 使用 L2 距离
+        "index_type": index_type,
+        "params": params
+    }
+
+
+def get_index_type(collection: Collection) -> str:
+    """读取集合上实际使用的索引类型"""
+    for index in collection.indexes:
+        if index.field_name == 'embedding':
+            return index.params.get('index_type', 'IVF_FLAT')
+    return 'IVF_FLAT'
+
+
+def load_index_settings(collection_name: str = COLLECTION_NAME) -> Dict[str, Any]:
+    """读取为集合保存的索引设置，没有时返回空字典"""
+    if not os.path.exists(INDEX_SETTINGS_PATH):
+        return {}
+    with open(INDEX_SETTINGS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f).get(collection_name, {})
+
+
+def save_index_settings(settings: Dict[str, Any], collection_name: str = COLLECTION_NAME):
+    """保存集合的索引设置，重启服务后生效"""
+    records = {}
+    if os.path.exists(INDEX_SETTINGS_PATH):
+        with open(INDEX_SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    records[collection_name] = settings
+    os.makedirs(os.path.dirname(INDEX_SETTINGS_PATH), exist_ok=True)
+    with open(INDEX_SETTINGS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+
+
+def build_search_params(index_type: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """根据索引类型生成搜索参数，overrides 覆盖默认值"""
+    if index_type == 'HNSW':
+        params = {"ef": VECTOR_SEARCH_EF}
+    elif index_type == 'FLAT':
+        params = {}
+    else:
+        params = {"nprobe": VECTOR_SEARCH_NPROBE}
+    params.update(overrides or {})
+    return {
+        "metric_type": "L2",
+        "params": params,
+    }
+
+
+def search_params_for_limit(search_params: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    """HNSW 的 ef 不能小于返回数量，不足时按返回数量放大"""
+    ef = search_params['params'].get('ef')
+    if ef is None or ef >= limit:
+        return search_params
+    return {**search_params, 'params': {**search_params['params'], 'ef': limit}}
+
+
+def _create_collection(name: str, dim: int) -> Collection:
+    print(f"创建新集合: {name}")
+    collection = Collection(name=name, schema=build_schema(dim), using='default', shards_num=2)
+
+    index_params = build_index_params(VECTOR_INDEX_TYPE, dim)
+    print(f"创建向量索引: {index_params}")
+    collection.create_index(field_name="embedding", index_params=index_params)
+    print("向量索引创建完成")
+    return collection
+
+
+def _is_alias(name: str) -> bool:
+    return name not in utility.list_collections()
+
+
+def _copy_rows(source: Collection, target: Collection, from_version: int) -> int:
+    """分批复制旧集合中的数据并逐级升级记录结构"""
+    output_fields = [field.name for field in source.schema.fields]
+    source.load()
+    iterator = source.query_iterator(batch_size=MIGRATION_BATCH_SIZE, expr="id >= 0",
+                                     output_fields=output_fields)
+    copied = 0
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            upgraded = [dict(row) for row in rows]
+            for version in range(from_version, SCHEMA_VERSION):
+                upgraded = MIGRATIONS[version](upgraded)
+            target.insert(upgraded)
+            copied += len(upgraded)
+            print(f"已迁移 {copied} 条记录")
+    finally:
+        iterator.close()
+    target.flush()
+    return copied
+
+
+def _migrate(current: Collection, from_version: int, dim: int) -> Collection:
+    """迁移到当前结构版本：在新的实际集合中重建数据和索引，然后切换别名"""
+    target_name = physical_name(SCHEMA_VERSION)
+    print(f"集合 {COLLECTION_NAME} 结构版本为 v{from_version}，开始迁移到 v{SCHEMA_VERSION}")
+
+    if utility.has_collection(target_name):
+        # 上次迁移中断留下的集合，重新迁移
+        print(f"删除未完成的迁移集合: {target_name}")
+        utility.drop_collection(target_name)
+
+    target = _create_collection(target_name, dim)
+    copied = _copy_rows(current, target, from_version)
+    print(f"数据迁移完成，共 {copied} 条记录")
+
+    if _is_alias(COLLECTION_NAME):
+        utility.alter_alias(target_name, COLLECTION_NAME)
+        print(f"别名 {COLLECTION_NAME} 已切换到 {target_name}，旧集合保留以便回滚")
+    else:
+        # 旧版本直接以 COLLECTION_NAME 命名，需要删除后才能创建同名别名
+        utility.drop_collection(COLLECTION_NAME)
+        utility.create_alias(target_name, COLLECTION_NAME)
+        print(f"已将旧集合替换为别名 {COLLECTION_NAME} -> {target_name}")
+
+    return Collection(COLLECTION_NAME)
+
+
+def ensure_collection(dim: int = VECTOR_DIM) -> Collection:
+    """确保集合存在且结构为当前版本
+
+    已有数据会被保留：版本一致时直接复用，版本较旧时迁移到新集合后切换别名。
+    """
+    try:
+        if utility.has_collection(COLLECTION_NAME):
+            collection = Collection(COLLECTION_NAME)
+            version = read_schema_version(collection)
+            if version == SCHEMA_VERSION:
+                index_type = get_index_type(collection)
+                print(f"集合 {COLLECTION_NAME} 已存在，结构版本 v{version}，索引类型 {index_type}")
+                if index_type != VECTOR_INDEX_TYPE:
+                    print(f"注意: 配置的索引类型 {VECTOR_INDEX_TYPE} 只对新建集合生效")
+                return collection
+            if version > SCHEMA_VERSION:
+                print(f"警告: 集合 {COLLECTION_NAME} 结构版本 v{version} 高于当前代码支持的 v{SCHEMA_VERSION}")
+                return collection
+            return _migrate(collection, version, dim)
+
+        target_name = physical_name(SCHEMA_VERSION)
+        if not utility.has_collection(target_name):
+            _create_collection(target_name, dim)
+        utility.create_alias(target_name, COLLECTION_NAME)
+        print(f"集合 {COLLECTION_NAME} 创建成功 -> {target_name}")
+        return Collection(COLLECTION_NAME)
+
+    except Exception as e:
+        print(f"确保集合存在时出错: {str(e)}")
+        raise
+
+
+_compaction_timer = None
+_compaction_lock = threading.Lock()
+
+
+def _compact():
+    global _compaction_timer
+    with _compaction_lock:
+        _compaction_timer = None
+    try:
+        collection = Collection(COLLECTION_NAME)
+        collection.compact()
+        print(f"集合 {COLLECTION_NAME} 已提交压缩任务: {collection.get_compaction_state()}")
+    except Exception as e:
+        print(f"压缩集合失败: {str(e)}")
+
+
+def schedule_compaction(delay: float = COMPACTION_DELAY):
+    """在后台延迟压缩集合，清理已删除的记录
+
+    延迟期间的多次删除只触发一次压缩，避免每次删除都重写数据段。
+    """
+    global _compaction_timer
+    with _compaction_lock:
+        if _compaction_timer is not None:
+            return
+        _compaction_timer = threading.Timer(delay, _compact)
+        _compaction_timer.daemon = True
+        _compaction_timer.start()
+    print(f"已安排 {delay:.0f} 秒后压缩集合 {COLLECTION_NAME}")
@@ -0,0 +1,51 @@
+import threading
+from typing import Optional
+
+# 知识库版本号，导入或删除文档后递增，依赖检索结果的缓存据此判断是否失效
+_version = 0
+# 集合中的有效记录数，启动时从 Milvus 读取一次，之后由导入和删除操作维护
+_row_count: Optional[int] = None
+_lock = threading.Lock()
+
+
+def corpus_version() -> int:
+    return _version
+
+
+def corpus_row_count() -> Optional[int]:
+    """缓存的记录数，尚未初始化时为 None"""
+    return _row_count
+
+
+def init_corpus_row_count(row_count: int):
+    """用 Milvus 中的实际记录数初始化，已初始化时忽略"""
+    global _row_count
+    with _lock:
+        if _row_count is None:
+            _row_count = row_count
+
+
+def set_corpus_row_count(row_count: int):
+    global _row_count
+    with _lock:
+        _row_count = row_count
+
+
+def bump_corpus_version(reason: str = '', row_delta: int = 0) -> int:
+    """知识库内容发生变化时调用
+
+    Args:
+        reason: 变化原因，用于日志
+        row_delta: 写入（正数）或删除（负数）的记录数
+
+    版本号和记录数只在当前进程内维护，其他进程（如命令行批量导入）的修改
+    依赖缓存的存活时间兜底。
+    """
+    global _version, _row_count
+    with _lock:
+        _version += 1
+        version = _version
+        if _row_count is not None:
+            _row_count = max(0, _row_count + row_delta)
+    print(f"知识库版本更新为 {version}{f'（{reason}）' if reason else ''}")
+    return version
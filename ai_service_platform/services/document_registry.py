@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Union
+from config import DOCUMENT_REGISTRY_PATH
+
+_COLUMNS = ('source', 'hash', 'pages', 'chunks', 'status', 'ingested_at')
+
+# 文档状态：导入中（失败或中断后保持该状态，重新导入时会先清理旧数据）、已完成
+STATUS_INDEXING = 'indexing'
+STATUS_READY = 'ready'
+
+
+def content_hash(document: Union[str, bytes]) -> str:
+    """计算文档内容的 sha256，document 为文件路径或文件内容"""
+    digest = hashlib.sha256()
+    if isinstance(document, bytes):
+        digest.update(document)
+    else:
+        with open(document, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """已导入文档的登记表
+
+    每个来源（文件名）一条记录，列表和删除都从登记表出发，无需扫描向量集合。
+    """
+
+    def __init__(self, path: str = DOCUMENT_REGISTRY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            'source TEXT PRIMARY KEY, hash TEXT NOT NULL, pages INTEGER NOT NULL, '
+            'chunks INTEGER NOT NULL, status TEXT NOT NULL, ingested_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_ingested_at ON documents (ingested_at)')
+        self.conn.commit()
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def upsert(self, source: str, hash: str, pages: int, chunks: int, status: str = STATUS_READY):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO documents (source, hash, pages, chunks, status, ingested_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (source, hash, pages, chunks, status, time.time())
+            )
+            self.conn.commit()
+
+    def delete(self, source: str) -> bool:
+        with self.lock:
+            deleted = self.conn.execute('DELETE FROM documents WHERE source = ?', (source,)).rowcount
+            self.conn.commit()
+        return deleted > 0
+
+    def list(self, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """按导入时间倒序分页列出文档"""
+        page = max(1, page)
+        page_size = max(1, min(page_size, 200))
+        with self.lock:
+            total = self.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents ORDER BY ingested_at DESC LIMIT ? OFFSET ?",
+                (page_size, (page - 1) * page_size)
+            ).fetchall()
+        return {
+            'items': [dict(zip(_COLUMNS, row)) for row in rows],
+            'total': total,
+            'page': page,
+            'page_size': page_size
+        }
+
+
+_shared_registry: Optional[DocumentRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def get_document_registry() -> DocumentRegistry:
+    """获取进程内共享的文档登记表"""
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = DocumentRegistry()
+        return _shared_registry
@@ -0,0 +1,135 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from config import (
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_DTYPE, EMBEDDING_CACHE_MAX_MB
+)
+
+# SQLite 单条语句的参数数量上限
+_SQL_BATCH = 500
+
+
+class EmbeddingCache:
+    """基于内容哈希的磁盘向量缓存
+
+    以 sha256(模型名称 + 是否归一化 + 文本) 为键，向量以 float16/float32
+    二进制形式保存在 SQLite 中。总大小超过上限时按最近访问时间淘汰。
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, dtype: str = EMBEDDING_CACHE_DTYPE,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'key TEXT PRIMARY KEY, vector BLOB NOT NULL, dtype TEXT NOT NULL, '
+            'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings (accessed)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM embeddings').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, text: str, normalize: bool) -> str:
+        payload = f"{model_name}\0{int(normalize)}\0{text}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """批量读取缓存，返回命中的 key -> float32 向量"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f'SELECT key, vector, dtype FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, blob, dtype in rows:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+            if found:
+                now = time.time()
+                self.conn.executemany('UPDATE embeddings SET accessed = ? WHERE key = ?',
+                                      [(now, key) for key in found])
+                self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """批量写入缓存"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = np.asarray(vector, dtype=self.dtype).tobytes()
+            rows.append((key, blob, self.dtype.name, len(blob), now))
+        with self.lock:
+            # 覆盖已存在的键时先扣除旧记录的大小
+            for i in range(0, len(rows), _SQL_BATCH):
+                batch = [row[0] for row in rows[i:i + _SQL_BATCH]]
+                placeholders = ','.join('?' * len(batch))
+                self.total_bytes -= self.conn.execute(
+                    f'SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchone()[0]
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector, dtype, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self.total_bytes += sum(row[3] for row in rows)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """淘汰最久未访问的记录，直到总大小降到上限的 90%"""
+        target = int(self.max_bytes * 0.9)
+        while self.total_bytes > target:
+            rows = self.conn.execute(
+                'SELECT key, size FROM embeddings ORDER BY accessed LIMIT ?', (_SQL_BATCH,)
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            evicted = []
+            for key, size in rows:
+                evicted.append((key,))
+                self.total_bytes -= size
+                if self.total_bytes <= target:
+                    break
+            self.conn.executemany('DELETE FROM embeddings WHERE key = ?', evicted)
+        print(f"向量缓存淘汰完成，当前大小: {self.total_bytes / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size_mb': round(self.total_bytes / 1024 / 1024, 2)
+        }
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取进程内共享的向量缓存，未启用时返回 None"""
+    global _shared_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
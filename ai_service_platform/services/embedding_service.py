@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Callable, List, Optional
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_BUCKET_BY_LENGTH, VECTOR_MODEL_NAME, EMBEDDING_BACKEND
+from services.embedding_cache import EmbeddingCache
+
+
+class EmbeddingService:
+    """批量向量生成服务
+
+    将文本按长度分桶后分批送入模型，避免逐条调用 encode，
+    同时让同一批次内的文本长度接近，减少 padding 带来的计算浪费。
+    配置了向量缓存时，已缓存的文本直接复用，只对未命中的文本调用模型。
+    """
+
+    def __init__(self, model=None, model_name: str = VECTOR_MODEL_NAME,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 bucket_by_length: bool = EMBEDDING_BUCKET_BY_LENGTH,
+                 cache: Optional[EmbeddingCache] = None,
+                 backend: str = EMBEDDING_BACKEND):
+        """
+        Args:
+            model: 向量模型，为空时在首次使用时从模型注册表获取共享实例
+            model_name: 模型名称，同时用作缓存键的一部分
+            backend: 推理后端，非 torch 后端的向量单独缓存
+        """
+        self._model = model
+        self.model_name = model_name
+        self.backend = backend
+        self.cache_name = model_name if backend == 'torch' else f"{model_name}@{backend}"
+        self.batch_size = max(1, batch_size)
+        self.bucket_by_length = bucket_by_length
+        self.cache = cache
+
+    @property
+    def model(self):
+        if self._model is None:
+            from services.model_registry import get_embedding_model
+            self._model = get_embedding_model(self.model_name, self.backend)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        """模型可处理的最大 token 数（不含特殊 token）"""
+        return max(1, getattr(self.model, 'max_seq_length', 512) - 2)
+
+    def encode_query(self, text: str, normalize: bool = True) -> np.ndarray:
+        """生成单条查询文本的向量，不经过磁盘缓存"""
+        return self.model.encode(text, normalize_embeddings=normalize, convert_to_numpy=True,
+                                 show_progress_bar=False)
+
+    def encode_queries(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """批量生成查询向量，不经过磁盘缓存"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        embeddings = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=normalize,
+                                       convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def _batches(self, texts: List[str], batch_size: int) -> List[List[int]]:
+        """按批次大小切分文本下标，开启分桶时先按长度排序"""
+        order = list(range(len(texts)))
+        if self.bucket_by_length:
+            order.sort(key=lambda i: len(texts[i]), reverse=True)
+        return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+    def _encode_model(self, texts: List[str], normalize: bool, batch_size: int,
+                      progress: Optional[Callable[[int], None]] = None) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        batches = self._batches(texts, batch_size)
+        done = 0
+        for batch_num, indices in enumerate(batches, 1):
+            vectors = self.model.encode(
+                [texts[i] for i in indices],
+                batch_size=len(indices),
+                normalize_embeddings=normalize,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            embeddings[indices] = vectors
+            done += len(indices)
+            print(f"已处理 {batch_num}/{len(batches)} 个批次")
+            if progress:
+                progress(done)
+        return embeddings
+
+    def encode(self, texts: List[str], normalize: bool = True,
+               batch_size: Optional[int] = None,
+               progress: Optional[Callable[[int], None]] = None) -> np.ndarray:
+        """批量生成向量
+        Args:
+            texts: 文本列表
+            normalize: 是否归一化向量
+            batch_size: 覆盖默认批次大小
+            progress: 每完成一个批次后以累计完成数量回调
+        Returns:
+            与输入顺序一致的向量矩阵，形状为 (len(texts), dim)
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        batch_size = max(1, batch_size or self.batch_size)
+
+        if self.cache is None:
+            return self._encode_model(texts, normalize, batch_size, progress)
+
+        # 先查询缓存，只对未命中的文本调用模型
+        keys = [EmbeddingCache.make_key(self.cache_name, text, normalize) for text in texts]
+        cached = self.cache.get_many(keys)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in cached:
+                embeddings[i] = cached[key]
+            else:
+                missing.append(i)
+
+        hit_count = len(texts) - len(missing)
+        if hit_count:
+            print(f"向量缓存命中 {hit_count}/{len(texts)} 个文本块")
+            if progress:
+                progress(hit_count)
+
+        if missing:
+            vectors = self._encode_model(
+                [texts[i] for i in missing], normalize, batch_size,
+                (lambda done: progress(hit_count + done)) if progress else None
+            )
+            embeddings[missing] = vectors
+            self.cache.put_many({keys[i]: vector for i, vector in zip(missing, vectors)})
+
+        return embeddings
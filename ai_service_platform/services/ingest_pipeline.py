@@ -0,0 +1,152 @@
+import threading
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from config import INGEST_EMBED_WINDOW, INGEST_INSERT_BATCH_SIZE, INGEST_QUEUE_SIZE
+
+# 阶段结束标记
+_DONE = object()
+
+
+class IngestPipeline:
+    """提取→分块→向量化→写入 流水线
+
+    各阶段运行在独立线程中，通过有界队列相连：提取与分块可以与向量生成重叠，
+    写入按固定批次进行，内存占用只与队列长度和批次大小有关，与文档大小无关。
+    """
+
+    def __init__(self,
+                 chunk_page: Callable[[int, str], List[Dict[str, Any]]],
+                 embedder,
+                 insert: Callable[[List[Dict[str, Any]]], Any],
+                 embed_window: int = INGEST_EMBED_WINDOW,
+                 insert_batch_size: int = INGEST_INSERT_BATCH_SIZE,
+                 queue_size: int = INGEST_QUEUE_SIZE,
+                 progress: Optional[Callable[..., None]] = None):
+        """
+        Args:
+            chunk_page: 将一页文本转换为实体列表（不含向量）的函数
+            embedder: EmbeddingService 实例
+            insert: 批量写入实体的函数
+            embed_window: 每次向量化的文本块数量
+            insert_batch_size: 每次写入的记录数
+            queue_size: 阶段间队列长度
+            progress: 进度回调，接收 pages_done、chunks_embedded、rows_inserted
+        """
+        self.chunk_page = chunk_page
+        self.embedder = embedder
+        self.insert = insert
+        self.embed_window = max(1, embed_window)
+        self.insert_batch_size = max(1, insert_batch_size)
+        self.queue_size = max(1, queue_size)
+        self.progress = progress or (lambda **values: None)
+        self._stop = threading.Event()
+        self._errors: List[Exception] = []
+
+    def _put(self, queue: Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _get(self, queue: Queue):
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.5)
+            except Empty:
+                continue
+        return _DONE
+
+    def _start(self, name: str, target: Callable, *args) -> threading.Thread:
+        def runner():
+            try:
+                target(*args)
+            except Exception as e:
+                print(f"流水线阶段 {name} 出错: {str(e)}")
+                self._errors.append(e)
+                self._stop.set()
+
+        thread = threading.Thread(target=runner, name=f'ingest-{name}', daemon=True)
+        thread.start()
+        return thread
+
+    def _chunk_stage(self, pages: Iterable[Tuple[int, str]], out: Queue):
+        """提取并分块，逐个产出实体"""
+        pages_done = 0
+        for page_num, text in pages:
+            if self._stop.is_set():
+                break
+            for entity in self.chunk_page(page_num, text):
+                if not self._put(out, entity):
+                    return
+            pages_done += 1
+            self.progress(pages_done=pages_done)
+        self._put(out, _DONE)
+
+    def _embed_stage(self, source: Queue, out: Queue):
+        """按窗口收集文本块并批量生成向量"""
+        chunks_embedded = 0
+        window = []
+        while True:
+            entity = self._get(source)
+            if entity is not _DONE:
+                window.append(entity)
+            if window and (entity is _DONE or len(window) >= self.embed_window):
+                embeddings = self.embedder.encode([item['content'] for item in window], normalize=True)
+                # 保留 numpy 行，写入时直接拼接，不转换为 Python 列表
+                for item, embedding in zip(window, embeddings):
+                    item['embedding'] = embedding
+                if not self._put(out, window):
+                    return
+                chunks_embedded += len(window)
+                self.progress(chunks_embedded=chunks_embedded)
+                window = []
+            if entity is _DONE:
+                self._put(out, _DONE)
+                return
+
+    def run(self, pages: Iterable[Tuple[int, str]]) -> Dict[str, int]:
+        """运行流水线
+        Args:
+            pages: 按页码顺序产出 (页码, 文本) 的迭代器
+        Returns:
+            统计信息，包含写入记录数 rows
+        """
+        chunk_queue = Queue(maxsize=self.embed_window * 2)
+        entity_queue = Queue(maxsize=self.queue_size)
+        threads = [
+            self._start('chunk', self._chunk_stage, pages, chunk_queue),
+            self._start('embed', self._embed_stage, chunk_queue, entity_queue)
+        ]
+
+        # 写入阶段在当前线程执行
+        rows_inserted = 0
+        buffer = []
+        try:
+            while True:
+                batch = self._get(entity_queue)
+                if self._errors:
+                    break
+                if batch is not _DONE:
+                    buffer.extend(batch)
+                while len(buffer) >= self.insert_batch_size or (batch is _DONE and buffer):
+                    rows = buffer[:self.insert_batch_size]
+                    buffer = buffer[self.insert_batch_size:]
+                    self.insert(rows)
+                    rows_inserted += len(rows)
+                    self.progress(rows_inserted=rows_inserted)
+                    print(f"已写入 {rows_inserted} 条记录")
+                if batch is _DONE:
+                    break
+        except Exception:
+            self._stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return {'rows': rows_inserted}
@@ -0,0 +1,111 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+from config import INGEST_MAX_WORKERS, INGEST_MAX_PENDING
+
+# 内存中保留的已结束任务数量
+MAX_FINISHED_JOBS = 200
+
+
+class JobQueueFullError(RuntimeError):
+    """排队任务已满"""
+
+
+class IngestionJobService:
+    """文档处理后台任务队列
+
+    上传请求只负责保存文件并提交任务，实际处理由固定大小的线程池执行，
+    任务进度保存在内存中供 /admin/jobs/<id> 查询。
+    """
+
+    def __init__(self, max_workers: int = INGEST_MAX_WORKERS, max_pending: int = INGEST_MAX_PENDING):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest')
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def _active_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+
+    def _prune(self):
+        """清理过旧的已结束任务"""
+        finished = [job for job in self.jobs.values() if job['status'] not in ('queued', 'running')]
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort(key=lambda job: job['created_at'])
+            for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self.jobs[job['id']]
+
+    def submit(self, file_path: str, handler: Callable[..., Dict[str, Any]]) -> str:
+        """提交处理任务
+        Args:
+            file_path: 已保存的文件路径
+            handler: 处理函数，签名为 handler(file_path, progress=callback)
+        Returns:
+            任务 ID
+        """
+        with self.lock:
+            if self._active_count() >= self.max_workers + self.max_pending:
+                raise JobQueueFullError('处理队列已满，请稍后再试')
+            self._prune()
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'id': job_id,
+                'file': os.path.basename(file_path),
+                'status': 'queued',
+                'pages_total': 0,
+                'pages_done': 0,
+                'chunks_embedded': 0,
+                'rows_inserted': 0,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'message': ''
+            }
+
+        self.executor.submit(self._run, job_id, file_path, handler)
+        print(f"已提交处理任务 {job_id}: {file_path}")
+        return job_id
+
+    def _update(self, job_id: str, **values):
+        with self.lock:
+            self.jobs[job_id].update(values)
+
+    def _run(self, job_id: str, file_path: str, handler: Callable[..., Dict[str, Any]]):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = handler(file_path, progress=lambda **values: self._update(job_id, **values))
+            if result.get('status') == 'success':
+                self._update(job_id, status='success', finished_at=time.time())
+            else:
+                self._update(job_id, status='error', finished_at=time.time(),
+                             message=result.get('message', '处理失败'))
+        except Exception as e:
+            print(f"处理任务 {job_id} 失败: {str(e)}")
+            self._update(job_id, status='error', finished_at=time.time(), message=str(e))
+
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(job)
+        elapsed = 0.0
+        if job['started_at']:
+            elapsed = (job['finished_at'] or time.time()) - job['started_at']
+        job['elapsed'] = round(elapsed, 2)
+        job['chunks_per_second'] = round(job['chunks_embedded'] / elapsed, 2) if elapsed > 0 else 0.0
+        job['pages_per_second'] = round(job['pages_done'] / elapsed, 2) if elapsed > 0 else 0.0
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务进度"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出任务"""
+        with self.lock:
+            jobs = [self._snapshot(job) for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
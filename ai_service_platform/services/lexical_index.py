@@ -0,0 +1,443 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+import numpy as np
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from config import (
+    LEXICAL_INDEX_DIR, LEXICAL_MAX_SEGMENTS, LEXICAL_MAX_DF_RATIO, LEXICAL_MIN_SKIP_DF, BM25_K1, BM25_B
+)
+
+# 只保留包含文字或数字的词，过滤空白和标点
+_TOKEN_RE = re.compile(r'\w')
+
+# SQLite 单条语句的参数数量上限
+_SQL_BATCH = 500
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba 搜索引擎模式分词，英文统一小写"""
+    import jieba
+    return [token.lower() for token in jieba.cut_for_search(text) if _TOKEN_RE.search(token)]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """按倒数排名融合多路检索结果，以 id 去重
+
+    每条结果的得分为其在各路结果中 1 / (k + 排名) 之和，得分写入 rrf_score；
+    多路都命中的结果合并各路的字段（如 distance 和 bm25），同名字段以靠前的一路为准。
+    """
+    scores: Dict[Any, float] = defaultdict(float)
+    hits: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, 1):
+            scores[hit['id']] += 1.0 / (k + rank)
+            hits[hit['id']] = {**hit, **hits[hit['id']]} if hit['id'] in hits else hit
+    fused = sorted(hits, key=lambda key: scores[key], reverse=True)
+    return [{**hits[key], 'rrf_score': scores[key]} for key in fused]
+
+
+class _Segment:
+    """不可变的倒排段
+
+    词表保存为 JSON，倒排表以 numpy 数组保存并以内存映射方式读取：
+    offsets[i]:offsets[i + 1] 为第 i 个词在 docs/tfs 中的区间，
+    docs 为段内文档序号（全局序号减去 base），lengths 为段内各文档的词数。
+    """
+
+    def __init__(self, directory: str, name: str, base: int):
+        self.name = name
+        self.base = base
+        prefix = os.path.join(directory, name)
+        with open(f"{prefix}.terms.json", 'r', encoding='utf-8') as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        self.offsets = np.load(f"{prefix}.offsets.npy")
+        self.docs = np.load(f"{prefix}.docs.npy", mmap_mode='r')
+        self.tfs = np.load(f"{prefix}.tfs.npy", mmap_mode='r')
+        self.lengths = np.load(f"{prefix}.lengths.npy", mmap_mode='r')
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.lengths)
+
+    def document_frequency(self, term: str) -> int:
+        i = self.terms.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def postings(self, term: str):
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    @staticmethod
+    def write(directory: str, name: str, terms: List[str], offsets: np.ndarray,
+              docs: np.ndarray, tfs: np.ndarray, lengths: np.ndarray):
+        prefix = os.path.join(directory, name)
+        with open(f"{prefix}.terms.json", 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+        for suffix, array in (('offsets', offsets.astype(np.int64)), ('docs', docs.astype(np.int32)),
+                              ('tfs', tfs.astype(np.uint16)), ('lengths', lengths.astype(np.uint32))):
+            with open(f"{prefix}.{suffix}.npy", 'wb') as f:
+                np.save(f, array)
+
+    @staticmethod
+    def remove(directory: str, name: str):
+        for suffix in ('terms.json', 'offsets.npy', 'docs.npy', 'tfs.npy', 'lengths.npy'):
+            path = os.path.join(directory, f"{name}.{suffix}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class LexicalBatch:
+    """一次导入中新增、尚未写入倒排段的分块，由 LexicalIndex.batch() 创建
+
+    每次导入使用各自的批次：commit 只写入本批次的分块，导入失败时 discard 丢弃，
+    并行的导入互不影响。
+    """
+
+    def __init__(self, index: 'LexicalIndex'):
+        self.index = index
+        # 分块主键 -> (词频列表, 词数)，保持登记顺序
+        self.entries: Dict[int, Tuple[Tuple[Tuple[str, int], ...], int]] = {}
+
+    def add(self, chunk_ids: Sequence[int], rows: Sequence[Dict[str, Any]]):
+        """登记新写入的分块，commit 后才可检索
+        Args:
+            chunk_ids: 分块在分块存储中的主键
+            rows: 与主键一一对应的分块记录，只使用 content 分词
+        """
+        tokenized = [tokenize(row['content']) for row in rows]
+        with self.index.lock:
+            for chunk_id, tokens in zip(chunk_ids, tokenized):
+                self.entries[int(chunk_id)] = (tuple(Counter(tokens).items()), len(tokens))
+
+    def commit(self):
+        self.index.commit(self)
+
+    def discard(self):
+        """丢弃尚未写入的分块；已 commit 的批次调用时不做任何事"""
+        self.index.discard(self)
+
+
+class LexicalIndex:
+    """基于 jieba 分词的 BM25 倒排索引
+
+    导入时新增的分块先缓存在各次导入的 LexicalBatch 中，commit 时写成一个新的倒排段；段数超过
+    LEXICAL_MAX_SEGMENTS 时合并为一个段并清除已删除文档的倒排记录。
+    SQLite 中只保存文档序号与分块主键的对应关系和词数，原文和来源信息由分块存储
+    （ChunkStore）统一保存；删除时只标记删除，不重写倒排段。
+    同一索引目录只允许一个进程写入，其他进程在检测到段列表变化时重新加载。
+    """
+
+    def __init__(self, directory: str = LEXICAL_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, 'docs.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._migrate_docs()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, chunk_id INTEGER NOT NULL, length INTEGER NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_docs_chunk_id ON docs (chunk_id)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS deleted (doc INTEGER PRIMARY KEY)')
+        self.conn.commit()
+        # 尚未 commit 的批次，删除分块时一并从中移除
+        self._batches: Set[LexicalBatch] = set()
+        self._load()
+
+    def _migrate_docs(self):
+        """旧版 docs 表保存了分块原文和来源信息，只保留序号、主键和词数"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(docs)')}
+        if 'content' not in columns:
+            return
+        print("倒排索引文档表去除原文和来源信息")
+        self.conn.execute('DROP INDEX IF EXISTS idx_docs_source')
+        self.conn.execute('ALTER TABLE docs RENAME TO docs_old')
+        self.conn.execute(
+            'CREATE TABLE docs (doc INTEGER PRIMARY KEY, chunk_id INTEGER NOT NULL, length INTEGER NOT NULL)'
+        )
+        self.conn.execute('INSERT INTO docs (doc, chunk_id, length) SELECT doc, chunk_id, length FROM docs_old')
+        self.conn.execute('DROP TABLE docs_old')
+        self.conn.commit()
+        self.conn.execute('VACUUM')
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not os.path.exists(self.meta_path):
+            return {'segments': [], 'next_doc': 0, 'sequence': 0}
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        meta = {
+            'segments': [{'name': segment.name, 'base': segment.base} for segment in self.segments],
+            'next_doc': self.next_doc,
+            'sequence': self.sequence
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self.meta_mtime = os.stat(self.meta_path).st_mtime
+
+    def _load(self):
+        meta = self._read_meta()
+        self.meta_mtime = os.stat(self.meta_path).st_mtime if os.path.exists(self.meta_path) else 0
+        self.segments = [_Segment(self.directory, item['name'], item['base']) for item in meta['segments']]
+        self.next_doc = meta['next_doc']
+        self.sequence = meta['sequence']
+        # 上次 commit 之前中断时留下的文档记录
+        self.conn.execute('DELETE FROM docs WHERE doc >= ?', (self.next_doc,))
+        self.conn.commit()
+        self.deleted = np.zeros(self.next_doc, dtype=bool)
+        for (doc,) in self.conn.execute('SELECT doc FROM deleted'):
+            if doc < self.next_doc:
+                self.deleted[doc] = True
+        self.live_docs, self.total_length = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs'
+        ).fetchone()
+
+    def _refresh(self):
+        """其他进程更新了索引时重新加载"""
+        if os.path.exists(self.meta_path) and os.stat(self.meta_path).st_mtime != self.meta_mtime:
+            with self.lock:
+                print("检测到倒排索引更新，重新加载")
+                self._load()
+
+    def batch(self) -> LexicalBatch:
+        """开始一次导入，新增的分块登记到返回的批次中"""
+        batch = LexicalBatch(self)
+        with self.lock:
+            self._batches.add(batch)
+        return batch
+
+    def discard(self, batch: LexicalBatch):
+        with self.lock:
+            self._batches.discard(batch)
+            batch.entries = {}
+
+    def commit(self, batch: LexicalBatch):
+        """把批次中的分块写成新的倒排段"""
+        with self.lock:
+            self._batches.discard(batch)
+            entries, batch.entries = batch.entries, {}
+            if not entries:
+                return
+            pending: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+            lengths, records = [], []
+            for local, (chunk_id, (counts, length)) in enumerate(entries.items()):
+                for term, tf in counts:
+                    pending[term].append((local, min(tf, 65535)))
+                lengths.append(length)
+                records.append((self.next_doc + local, chunk_id, length))
+            terms = sorted(pending)
+            counts = np.array([len(pending[term]) for term in terms], dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            postings = np.array([posting for term in terms for posting in pending[term]],
+                                dtype=np.int64).reshape(-1, 2)
+
+            self.sequence += 1
+            name = f"seg_{self.sequence:06d}"
+            _Segment.write(self.directory, name, terms, offsets, postings[:, 0], postings[:, 1],
+                           np.array(lengths))
+            self.segments = self.segments + [_Segment(self.directory, name, self.next_doc)]
+
+            added = len(lengths)
+            self.live_docs += added
+            self.total_length += sum(lengths)
+            self.next_doc += added
+            self.deleted = np.concatenate((self.deleted, np.zeros(added, dtype=bool)))
+            self.conn.executemany('INSERT INTO docs (doc, chunk_id, length) VALUES (?, ?, ?)', records)
+            self.conn.commit()
+
+            if len(self.segments) > LEXICAL_MAX_SEGMENTS:
+                self._merge()
+            self._write_meta()
+            print(f"倒排索引新增 {added} 个分块，共 {len(self.segments)} 个段")
+
+    def _merge(self):
+        """合并全部段，清除已删除文档的倒排记录，需持有锁"""
+        old_segments = self.segments
+        base = old_segments[0].base
+        vocabulary = sorted(set().union(*(segment.terms for segment in old_segments)))
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+        all_terms, all_docs, all_tfs, lengths = [], [], [], []
+        for segment in old_segments:
+            mapping = np.empty(len(segment.terms), dtype=np.int64)
+            for term, i in segment.terms.items():
+                mapping[i] = term_ids[term]
+            docs = np.asarray(segment.docs, dtype=np.int64) + segment.base
+            alive = ~self.deleted[docs]
+            all_terms.append(np.repeat(mapping, np.diff(segment.offsets))[alive])
+            all_docs.append(docs[alive] - base)
+            all_tfs.append(np.asarray(segment.tfs)[alive])
+            lengths.append(np.asarray(segment.lengths))
+
+        terms = np.concatenate(all_terms)
+        docs = np.concatenate(all_docs)
+        tfs = np.concatenate(all_tfs)
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        # 去掉只出现在已删除文档中的词
+        used, counts = np.unique(terms, return_counts=True)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.sequence += 1
+        name = f"seg_{self.sequence:06d}"
+        _Segment.write(self.directory, name, [vocabulary[i] for i in used], offsets, docs, tfs,
+                       np.concatenate(lengths))
+        self.segments = [_Segment(self.directory, name, base)]
+
+        # 已删除文档的倒排记录已清除，无需再保留删除标记
+        self.conn.execute('DELETE FROM deleted')
+        self.conn.commit()
+        self._write_meta()
+        for segment in old_segments:
+            _Segment.remove(self.directory, segment.name)
+        print(f"倒排索引已合并 {len(old_segments)} 个段")
+
+    def delete(self, chunk_ids: Sequence[int]) -> int:
+        """按分块主键标记删除，尚未 commit 的批次中的分块直接移除，返回删除的分块数"""
+        chunk_ids = [int(chunk_id) for chunk_id in chunk_ids]
+        with self.lock:
+            dropped = 0
+            for pending in self._batches:
+                for chunk_id in chunk_ids:
+                    if pending.entries.pop(chunk_id, None) is not None:
+                        dropped += 1
+            rows = []
+            for i in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[i:i + _SQL_BATCH]
+                rows.extend(self.conn.execute(
+                    f"SELECT doc, length FROM docs WHERE chunk_id IN ({','.join('?' * len(batch))})", batch
+                ))
+            if not rows:
+                return dropped
+            committed = [doc for doc, _ in rows]
+            self.conn.executemany('INSERT OR IGNORE INTO deleted (doc) VALUES (?)', [(doc,) for doc in committed])
+            self.conn.executemany('DELETE FROM docs WHERE doc = ?', [(doc,) for doc in committed])
+            self.conn.commit()
+            self.deleted[committed] = True
+            self.live_docs -= len(committed)
+            self.total_length -= sum(length for _, length in rows)
+            return dropped + len(committed)
+
+    def _fetch_chunk_ids(self, docs: List[int]) -> Dict[int, int]:
+        found = {}
+        with self.lock:
+            for i in range(0, len(docs), _SQL_BATCH):
+                batch = docs[i:i + _SQL_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                found.update(self.conn.execute(
+                    f"SELECT doc, chunk_id FROM docs WHERE doc IN ({placeholders})", batch
+                ).fetchall())
+        return found
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """BM25 检索
+        Returns:
+            按得分降序排列的分块，包含 id（分块主键）和 bm25 得分，文本由调用方从分块存储读取
+        """
+        self._refresh()
+        segments, deleted = self.segments, self.deleted
+        live_docs, total_length = self.live_docs, self.total_length
+        if not segments or live_docs <= 0:
+            return []
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        frequencies = {term: sum(segment.document_frequency(term) for segment in segments) for term in terms}
+        terms = [term for term in terms if frequencies[term]]
+        # 出现在大量文档中的词区分度很低，倒排表又最长，跳过以控制延迟；只包含这类词的查询
+        # 交给向量检索。语料较小时倒排表很短，不跳过；查询中以空白分隔、原样出现的词
+        # （型号、编号等精确匹配）即使很常见也保留
+        max_df = max(LEXICAL_MAX_DF_RATIO * live_docs, LEXICAL_MIN_SKIP_DF)
+        verbatim = {word.lower() for word in query.split()}
+        terms = [term for term in terms if frequencies[term] <= max_df or term in verbatim]
+        if not terms:
+            return []
+
+        avgdl = total_length / live_docs
+        candidates = []
+        for segment in segments:
+            matched_docs, contributions = [], []
+            for term in terms:
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                docs, tfs = postings
+                # 文档频率包含尚未合并清除的已删除文档，不超过有效文档数，idf 不为负
+                df = min(frequencies[term], live_docs)
+                idf = math.log(1 + (live_docs - df + 0.5) / (df + 0.5))
+                tfs = tfs.astype(np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths[docs] / avgdl)
+                matched_docs.append(docs)
+                contributions.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+            if not matched_docs:
+                continue
+
+            docs = np.concatenate(matched_docs)
+            contributions = np.concatenate(contributions)
+            if len(docs) * 8 > segment.doc_count:
+                # 命中的倒排记录较多时直接按段内文档数累加
+                scores = np.zeros(segment.doc_count, dtype=np.float32)
+                for term_docs, term_scores in zip(matched_docs, np.split(contributions, np.cumsum(
+                        [len(term_docs) for term_docs in matched_docs])[:-1])):
+                    scores[term_docs] += term_scores
+                docs = np.flatnonzero(scores)
+                scores = scores[docs]
+            else:
+                # 否则只在命中的文档上累加，耗时与倒排记录数成正比
+                docs, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=contributions).astype(np.float32)
+            alive = ~deleted[docs + segment.base]
+            docs, scores = docs[alive], scores[alive]
+            if len(docs) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+                docs, scores = docs[top], scores[top]
+            candidates.extend((float(score), int(doc) + segment.base) for doc, score in zip(docs, scores))
+
+        candidates.sort(reverse=True)
+        candidates = candidates[:limit]
+        chunk_ids = self._fetch_chunk_ids([doc for _, doc in candidates])
+        return [{'id': chunk_ids[doc], 'bm25': score} for score, doc in candidates if doc in chunk_ids]
+
+    def reset(self):
+        """清空索引"""
+        with self.lock:
+            for segment in self.segments:
+                _Segment.remove(self.directory, segment.name)
+            self.segments = []
+            self.next_doc = 0
+            self.conn.execute('DELETE FROM docs')
+            self.conn.execute('DELETE FROM deleted')
+            self.conn.commit()
+            self.deleted = np.zeros(0, dtype=bool)
+            self.live_docs, self.total_length = 0, 0
+            self._write_meta()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'documents': self.live_docs,
+            'segments': len(self.segments),
+            'pending': sum(len(batch.entries) for batch in self._batches)
+        }
+
+
+_shared_index: Optional[LexicalIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """获取进程内共享的倒排索引"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = LexicalIndex()
+        return _shared_index
@@ -0,0 +1,148 @@
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    QWEN_API_URL, LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_ROUTE_TIMEOUT,
+    LLM_ROUTE_RETRIES, LLM_RETRIES, LLM_RETRY_BACKOFF
+)
+from services.prompt_templates import build_request
+
+# 视为暂时不可用、可以重试的状态码（模型加载中或网关超时）
+RETRY_STATUS = {502, 503, 504}
+
+# 指标回调：(路由, {'status', 'attempts', 'seconds', 'error'})，seconds 为收到响应头的耗时
+Listener = Callable[[str, Dict[str, Any]], None]
+
+
+class LLMClient:
+    """所有服务共享的大模型 HTTP 客户端
+
+    请求复用同一个连接池中的长连接，不必每次重新建立 TCP 连接；超时和重试次数按路由
+    配置。重试只发生在收到响应之前（连接失败或 RETRY_STATUS），流式响应开始后不会
+    重发。每次请求的耗时和结果计入 stats()，并通知 add_listener 注册的回调。
+    """
+
+    def __init__(self, url: str = QWEN_API_URL, pool_size: int = LLM_POOL_SIZE):
+        self.url = url
+        self.pool_size = max(1, pool_size)
+        self.session = requests.Session()
+        # 只访问一个地址，连接池按并发请求数设置；超出时临时建立连接，不阻塞调用方
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.listeners: List[Listener] = []
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {'requests': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0}
+        )
+
+    def add_listener(self, listener: Listener):
+        """注册指标回调，每次请求结束（收到响应或最终失败）后调用"""
+        self.listeners.append(listener)
+
+    def _record(self, route: str, status: Optional[int], attempts: int, seconds: float, error: Optional[str]):
+        with self.lock:
+            metrics = self.metrics[route]
+            metrics['requests'] += 1
+            metrics['retries'] += attempts - 1
+            metrics['seconds'] += seconds
+            if error is not None:
+                metrics['errors'] += 1
+        event = {'status': status, 'attempts': attempts, 'seconds': seconds, 'error': error}
+        for listener in self.listeners:
+            try:
+                listener(route, event)
+            except Exception as e:
+                print(f"大模型指标回调出错: {str(e)}")
+
+    def post(self, route: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> requests.Response:
+        """发送请求并检查状态码，payload['stream'] 为真时返回流式响应
+        Args:
+            route: 调用路由，决定超时和重试次数
+            timeout: 覆盖该路由的响应超时秒数
+        """
+        stream = bool(payload.get('stream'))
+        read_timeout = timeout if timeout is not None else LLM_ROUTE_TIMEOUT.get(route, 60)
+        retries = LLM_ROUTE_RETRIES.get(route, LLM_RETRIES)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            status = None
+            try:
+                response = self.session.post(self.url, json=payload, stream=stream,
+                                             timeout=(LLM_CONNECT_TIMEOUT, read_timeout))
+                status = response.status_code
+                if status in RETRY_STATUS and attempt <= retries:
+                    response.close()
+                    raise requests.ConnectionError(f"服务暂时不可用: {status}")
+                response.raise_for_status()
+            except requests.ConnectionError as e:
+                # 包括连接超时；读取超时说明请求已在处理，不再重发
+                if attempt <= retries:
+                    print(f"大模型请求失败（{route}，第 {attempt} 次），稍后重试: {str(e)}")
+                    time.sleep(LLM_RETRY_BACKOFF * 2 ** (attempt - 1))
+                    continue
+                self._record(route, status, attempt, time.perf_counter() - start, str(e))
+                raise
+            except Exception as e:
+                self._record(route, status, attempt, time.perf_counter() - start, str(e))
+                raise
+            self._record(route, status, attempt, time.perf_counter() - start, None)
+            return response
+
+    def chat(self, route: str, messages: List[Dict[str, str]], stream: bool,
+             timeout: Optional[float] = None) -> requests.Response:
+        """按路由的请求参数调用 /api/chat"""
+        return self.post(route, build_request(route, messages, stream), timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'pool_size': self.pool_size,
+                'routes': {
+                    route: {
+                        'requests': int(metrics['requests']),
+                        'errors': int(metrics['errors']),
+                        'retries': int(metrics['retries']),
+                        'avg_seconds': round(metrics['seconds'] / metrics['requests'], 3) if metrics['requests'] else 0.0
+                    }
+                    for route, metrics in self.metrics.items()
+                }
+            }
+
+
+@contextmanager
+def streaming(response: requests.Response) -> Iterator[requests.Response]:
+    """读取流式响应，退出时释放连接
+
+    正常读完（收到 done 后退出）时先读掉剩余内容，连接回到连接池继续复用；中途退出
+    （出错或客户端断开导致生成器关闭）时直接关闭连接。
+    """
+    try:
+        yield response
+        try:
+            # done 之后通常只剩分块结束标记
+            for _ in response.iter_content(chunk_size=8192):
+                pass
+        except Exception as e:
+            print(f"读取剩余响应失败: {str(e)}")
+    finally:
+        response.close()
+
+
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """获取进程内共享的大模型客户端"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
@@ -0,0 +1,58 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """线程安全的内存 LRU 缓存，条目超过存活时间后失效
+
+    容量满时淘汰最久未使用的条目；ttl 为 0 表示不过期。
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if not expires_at or expires_at > time.monotonic():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self.lock:
+            self.data[key] = (value, expires_at)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
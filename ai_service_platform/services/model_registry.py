@@ -0,0 +1,106 @@
+import threading
+from typing import Dict
+from config import MILVUS_HOST, MILVUS_PORT, VECTOR_MODEL_NAME, EMBEDDING_BACKEND, ONNX_MODEL_DIR
+
+# 进程内共享的模型与服务实例，按名称索引
+_models: Dict[str, object] = {}
+_embedders: Dict[str, object] = {}
+_lock = threading.Lock()
+_model_locks: Dict[str, threading.Lock] = {}
+_milvus_lock = threading.Lock()
+_milvus_connected = False
+
+
+def _model_lock(name: str) -> threading.Lock:
+    with _lock:
+        return _model_locks.setdefault(name, threading.Lock())
+
+
+def _load_embedding_model(name: str, backend: str):
+    if backend in ('onnx', 'onnx-int8'):
+        from services.onnx_embedding import OnnxEmbeddingModel
+        model_dir = ONNX_MODEL_DIR if name == VECTOR_MODEL_NAME else name
+        return OnnxEmbeddingModel(model_dir, quantized=backend == 'onnx-int8')
+    if backend != 'torch':
+        raise ValueError(f"不支持的向量推理后端: {backend}")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def get_embedding_model(name: str = VECTOR_MODEL_NAME, backend: str = EMBEDDING_BACKEND):
+    """获取共享的向量模型，首次调用时加载，多线程下只加载一次"""
+    key = f"{name}@{backend}"
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _model_lock(key):
+        model = _models.get(key)
+        if model is None:
+            print(f"加载向量模型: {name} ({backend})")
+            model = _load_embedding_model(name, backend)
+            _models[key] = model
+    return model
+
+
+def get_reranker_model(name: str):
+    """获取共享的 CrossEncoder 重排模型，首次调用时加载"""
+    key = f"{name}@cross-encoder"
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _model_lock(key):
+        model = _models.get(key)
+        if model is None:
+            print(f"加载重排模型: {name}")
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(name, max_length=512)
+            _models[key] = model
+    return model
+
+
+def get_tokenizer(name: str):
+    """获取共享的 Hugging Face 分词器，首次调用时加载"""
+    key = f"{name}@tokenizer"
+    tokenizer = _models.get(key)
+    if tokenizer is not None:
+        return tokenizer
+
+    with _model_lock(key):
+        tokenizer = _models.get(key)
+        if tokenizer is None:
+            print(f"加载分词器: {name}")
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            _models[key] = tokenizer
+    return tokenizer
+
+
+def get_embedding_service(name: str = VECTOR_MODEL_NAME, backend: str = EMBEDDING_BACKEND):
+    """获取共享的 EmbeddingService，模型在第一次生成向量时才加载"""
+    key = f"{name}@{backend}"
+    embedder = _embedders.get(key)
+    if embedder is not None:
+        return embedder
+
+    from services.embedding_service import EmbeddingService
+    from services.embedding_cache import get_embedding_cache
+    with _lock:
+        embedder = _embedders.get(key)
+        if embedder is None:
+            embedder = EmbeddingService(model_name=name, backend=backend, cache=get_embedding_cache())
+            _embedders[key] = embedder
+    return embedder
+
+
+def connect_milvus():
+    """建立默认 Milvus 连接，进程内只连接一次"""
+    global _milvus_connected
+    if _milvus_connected:
+        return
+    with _milvus_lock:
+        if not _milvus_connected:
+            from pymilvus import connections
+            connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+            _milvus_connected = True
@@ -0,0 +1,69 @@
+import os
+import json
+import numpy as np
+from typing import List, Union
+from config import ONNX_NUM_THREADS
+
+# 导出目录中的文件名
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_INT8_MODEL_FILE = 'model.int8.onnx'
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+
+class OnnxEmbeddingModel:
+    """基于 ONNX Runtime 的向量模型
+
+    与 SentenceTransformer 提供相同的 encode / get_sentence_embedding_dimension 接口，
+    可以直接替换到 EmbeddingService 中。模型目录由 scripts/export_onnx.py 生成。
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.max_seq_length = config['max_seq_length']
+        self.dimension = config['dimension']
+        self.pooling = config.get('pooling', 'mean')
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_NUM_THREADS:
+            options.intra_op_num_threads = ONNX_NUM_THREADS
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        print(f"加载 ONNX 向量模型: {os.path.join(model_dir, model_file)}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling == 'cls':
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """生成向量，参数与 SentenceTransformer.encode 保持一致，结果总是 numpy 数组"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        outputs = []
+        for i in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(sentences[i:i + batch_size], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors='np')
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            outputs.append(self._pool(hidden, encoded['attention_mask']))
+
+        embeddings = np.concatenate(outputs).astype(np.float32) if outputs \
+            else np.zeros((0, self.dimension), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
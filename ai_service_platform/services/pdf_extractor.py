@@ -0,0 +1,159 @@
+import io
+import os
+import threading
+import multiprocessing
+from functools import partial
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple, Union
+from PyPDF2 import PdfReader
+from config import PDF_EXTRACT_WORKERS, PDF_EXTRACT_MIN_PAGES, PDF_EXTRACT_PAGES_PER_TASK
+
+# PDF 来源：文件路径或文件内容
+PdfSource = Union[str, bytes]
+
+
+def _open_reader(source: PdfSource) -> PdfReader:
+    if isinstance(source, bytes):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+# 子进程中最近打开的 PDF：(路径或共享内存名, 修改时间, 大小, reader)，同一文件的后续任务不再重新解析
+_worker_reader: Optional[Tuple[str, Optional[float], int, PdfReader]] = None
+
+
+def _reader_for(path: str) -> PdfReader:
+    global _worker_reader
+    stat = os.stat(path)
+    if _worker_reader is None or _worker_reader[:3] != (path, stat.st_mtime, stat.st_size):
+        _worker_reader = (path, stat.st_mtime, stat.st_size, PdfReader(path))
+    return _worker_reader[3]
+
+
+def _shared_reader_for(name: str, size: int) -> PdfReader:
+    """从共享内存读取文件内容，每个子进程对同一文档只复制一次"""
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[:3] != (name, None, size):
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            data = bytes(shm.buf[:size])
+        finally:
+            shm.close()
+        _worker_reader = (name, None, size, PdfReader(io.BytesIO(data)))
+    return _worker_reader[3]
+
+
+def _read_range(reader: PdfReader, start: int, end: int) -> List[Tuple[int, str]]:
+    results = []
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text() or ''
+        except Exception as e:
+            print(f"提取第 {index + 1} 页文本时出错: {str(e)}")
+            text = ''
+        results.append((index + 1, text))
+    return results
+
+
+def _extract_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """在子进程中提取 [start, end) 范围内的页面文本，页码从 1 开始"""
+    return _read_range(_reader_for(path), start, end)
+
+
+def _extract_shared_range(name: str, size: int, start: int, end: int) -> List[Tuple[int, str]]:
+    """同 _extract_range，文件内容位于共享内存 name 的前 size 字节"""
+    return _read_range(_shared_reader_for(name, size), start, end)
+
+
+def _mp_context():
+    """优先使用 forkserver，其次 spawn
+
+    不从 Web 进程直接 fork：父进程持有模型、SQLite 连接和多个线程，fork 出的子进程
+    可能继承被其他线程持有的锁。forkserver 的服务进程只预加载本模块。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """进程内共享的提取进程池，并行导入的文档共用，进程总数不超过 workers"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def count_pages(source: PdfSource) -> int:
+    """获取 PDF 总页数"""
+    return len(_open_reader(source).pages)
+
+
+def iter_pages(source: PdfSource, workers: int = PDF_EXTRACT_WORKERS,
+               pages_per_task: int = PDF_EXTRACT_PAGES_PER_TASK) -> Iterator[Tuple[int, str]]:
+    """按页码顺序逐页返回 (页码, 文本)
+
+    页数较多时将 PDF 切分为若干页码区间，交给共享的进程池并行提取，
+    结果仍按页码顺序产出，调用方可以边提取边处理。任务只传递文件路径；内存中的
+    文件内容（如压缩包成员）放入共享内存，任务只传递共享内存名，不写入磁盘。
+    子进程对同一文件只解析一次。
+    """
+    reader = _open_reader(source)
+    total_pages = len(reader.pages)
+    if workers <= 1 or total_pages < PDF_EXTRACT_MIN_PAGES:
+        yield from _read_range(reader, 0, total_pages)
+        return
+
+    step = max(1, pages_per_task)
+    ranges = [(start, min(start + step, total_pages)) for start in range(0, total_pages, step)]
+    print(f"使用 {min(workers, len(ranges))} 个进程并行提取 {total_pages} 页文本")
+
+    shm = None
+    if isinstance(source, bytes):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(source)))
+        shm.buf[:len(source)] = source
+        task = partial(_extract_shared_range, shm.name, len(source))
+    else:
+        task = partial(_extract_range, source)
+    futures = []
+    try:
+        executor = _get_executor(workers)
+        futures = [executor.submit(task, start, end) for start, end in ranges]
+        # 按提交顺序读取结果，保证页码有序
+        for future in futures:
+            yield from future.result()
+    except BrokenProcessPool:
+        _reset_executor()
+        raise
+    finally:
+        # 调用方提前停止时取消尚未开始的任务
+        for future in futures:
+            future.cancel()
+        if shm is not None:
+            # 正在运行的任务结束后才能释放共享内存
+            wait(futures)
+            shm.close()
+            shm.unlink()
+
+
+def extract_pages(source: PdfSource, workers: int = PDF_EXTRACT_WORKERS) -> List[Tuple[int, str]]:
+    """并行提取全部页面文本，返回按页码排序的 (页码, 文本) 列表"""
+    return list(iter_pages(source, workers))
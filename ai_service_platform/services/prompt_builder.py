@@ -0,0 +1,113 @@
+import re
+import threading
+from typing import Any, Dict, List, Set, Tuple
+from config import QWEN_TOKENIZER_NAME, PROMPT_CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+from services.prompt_templates import RAG_USER_TEMPLATE, build_messages
+
+# 去重时比较的字符 n-gram 长度
+_SHINGLE_SIZE = 4
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def shingles(text: str) -> Set[str]:
+    """去除空白后的字符 n-gram 集合"""
+    text = _WHITESPACE_RE.sub('', text)
+    if len(text) <= _SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + _SHINGLE_SIZE] for i in range(len(text) - _SHINGLE_SIZE + 1)}
+
+
+def relevance(context: Dict[str, Any]) -> float:
+    """上下文的相关性得分：优先使用重排得分，其次为融合得分和向量相似度"""
+    for key in ('rerank_score', 'rrf_score', 'similarity'):
+        if context.get(key) is not None:
+            return float(context[key])
+    return 0.0
+
+
+class PromptBuilder:
+    """在 token 预算内组装 RAG 提示词
+
+    上下文按相关性从高到低装入，与已装入的上下文内容大部分重合的（如相邻分块的重叠
+    部分、重复上传的文档）直接丢弃；装不下的上下文跳过，最相关的上下文单独超出预算
+    时截断。token 数按 Qwen 分词器计算，分词器无法加载时按字符数估算。
+    """
+
+    def __init__(self, budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+                 tokenizer_name: str = QWEN_TOKENIZER_NAME):
+        self.budget = max(1, budget)
+        self.dedup_threshold = dedup_threshold
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._tokenizer_failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None and not self._tokenizer_failed:
+            with self._lock:
+                if self._tokenizer is None and not self._tokenizer_failed:
+                    try:
+                        from services.model_registry import get_tokenizer
+                        self._tokenizer = get_tokenizer(self.tokenizer_name)
+                    except Exception as e:
+                        print(f"加载分词器 {self.tokenizer_name} 失败，按字符数估算 token 数: {str(e)}")
+                        self._tokenizer_failed = True
+        return self._tokenizer
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """批量计算 token 数"""
+        tokenizer = self.tokenizer
+        if tokenizer is None or not texts:
+            return [len(text) for text in texts]
+        encoded = tokenizer(texts, add_special_tokens=False, return_attention_mask=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return text[:tokens]
+        ids = tokenizer(text, add_special_tokens=False, return_attention_mask=False)['input_ids']
+        return tokenizer.decode(ids[:tokens])
+
+    def _is_duplicate(self, grams: Set[str], selected: List[Set[str]]) -> bool:
+        for other in selected:
+            overlap = len(grams & other)
+            if overlap and overlap >= self.dedup_threshold * min(len(grams), len(other)):
+                return True
+        return False
+
+    def pack(self, contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """选出装入提示词的上下文，按相关性降序排列，每条附带 token 数 tokens"""
+        ranked = sorted(contexts, key=relevance, reverse=True)
+        lengths = self.count_tokens([context['content'] for context in ranked])
+        packed: List[Dict[str, Any]] = []
+        packed_grams: List[Set[str]] = []
+        used = 0
+        for context, length in zip(ranked, lengths):
+            grams = shingles(context['content'])
+            if self._is_duplicate(grams, packed_grams):
+                continue
+            if used + length > self.budget:
+                if packed:
+                    continue
+                context = {**context, 'content': self._truncate(context['content'], self.budget)}
+                length = self.budget
+            packed.append({**context, 'tokens': length})
+            packed_grams.append(grams)
+            used += length
+        return packed
+
+    def build(self, query: str,
+              contexts: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]], int]:
+        """组装 rag 路由的消息，system 前缀固定，上下文和问题放在 user 消息中
+        Returns:
+            (消息列表, 实际装入的上下文, 提示词 token 数)
+        """
+        packed = self.pack(contexts)
+        messages = build_messages('rag', RAG_USER_TEMPLATE.format(
+            contexts='\n\n'.join(context['content'] for context in packed), query=query
+        ))
+        prompt_tokens = sum(self.count_tokens([message['content'] for message in messages]))
+        print(f"提示词 {prompt_tokens} tokens，装入上下文 {len(packed)}/{len(contexts)} 条")
+        return messages, packed, prompt_tokens
@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional
+from config import QWEN_MODEL, LLM_ROUTE_KEEP_ALIVE, LLM_NUM_CTX, LLM_PRELOAD_ROUTES
+
+# 各调用路由的提示词模板。静态指令统一放在内容固定的 system 消息中，文档、问题等
+# 动态内容只出现在之后的 user 消息里：同一路由的请求共享完全相同的前缀，Ollama 可以
+# 复用前缀的 KV 缓存，不必每次重新预填充指令
+RAG_SYSTEM_PROMPT = """基于用户提供的文档内容回答用户的问题。如果无法从文档中找到答案，请说明无法回答。
+如果文档内容与问题相关，请详细解释。如果不相关，请明确指出。
+请提供准确、详细的回答。"""
+
+RAG_USER_TEMPLATE = """文档内容：
+{contexts}
+
+用户问题：{query}"""
+
+INTENT_SYSTEM_PROMPT = """你是一个意图识别专家。你需要分析用户的输入，并从以下选项中选择最匹配的意图：
+1. CHAT - 普通聊天对话
+2. QUERY - 文档检索查询
+3. AGENT - 需要特定 Agent 处理
+请只返回意图代码（CHAT/QUERY/AGENT），不要包含其他内容。"""
+
+SUMMARIZE_SYSTEM_PROMPT = "请对以下文本进行简要总结，突出重点内容。"
+
+# 各路由的 system 提示词（None 表示不加 system 消息）与采样参数
+ROUTES: Dict[str, Dict[str, Any]] = {
+    'rag': {'system': RAG_SYSTEM_PROMPT, 'options': {}},
+    'chat': {'system': None, 'options': {}},
+    'intent': {'system': INTENT_SYSTEM_PROMPT, 'options': {'temperature': 0, 'num_predict': 8}},
+    'summarize': {'system': SUMMARIZE_SYSTEM_PROMPT, 'options': {}},
+}
+
+
+def build_messages(route: str, content: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """system 前缀 + 历史消息 + 本次的 user 消息"""
+    system = ROUTES[route]['system']
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def _keep_alive(value: str):
+    """纯数字按秒数传给 Ollama（-1 表示一直保留），其余按时长字符串（如 30m）传递"""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+def build_request(route: str, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+    """Ollama /api/chat 请求体，带上该路由的 keep_alive，避免模型在请求间隙被卸载"""
+    return {
+        "model": QWEN_MODEL,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": _keep_alive(LLM_ROUTE_KEEP_ALIVE[route]),
+        # num_ctx 所有路由一致，采样参数按路由设置
+        "options": {"num_ctx": LLM_NUM_CTX, **ROUTES[route]['options']}
+    }
+
+
+def preload(routes: Optional[List[str]] = None):
+    """预加载模型并预填充各路由的 system 前缀
+
+    没有 system 提示词的路由只加载模型（messages 为空时 Ollama 只加载不生成）。
+    """
+    from services.llm_client import get_llm_client
+    client = get_llm_client()
+    routes = routes if routes is not None else LLM_PRELOAD_ROUTES
+    for route in routes:
+        system = ROUTES[route]['system']
+        request = build_request(route, [{"role": "system", "content": system}] if system else [], stream=False)
+        request['options']['num_predict'] = 1
+        try:
+            # 加载模型可能较慢，不受路由的响应超时限制
+            client.post(route, request, timeout=300)
+            print(f"已预加载模型 {QWEN_MODEL}（{route}）")
+        except Exception as e:
+            print(f"预加载模型失败（{route}）: {str(e)}")
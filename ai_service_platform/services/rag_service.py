@@ -1,100 +1,226 @@
-from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import json
 import os
 import re
-import requests
-from PyPDF2 import PdfReader
-from typing import List, Dict, Any, Generator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Generator, Callable, Iterable, Optional
 from config import (
-    MILVUS_HOST, MILVUS_PORT, COLLECTION_NAME,
-    QWEN_API_URL, QWEN_MODEL, VECTOR_MODEL_NAME
+    VECTOR_RERANK_CANDIDATES,
+    BULK_INGEST_WORKERS, BULK_INSERT_BATCH_SIZE, QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL,
+    ANSWER_CACHE_ENABLED, HYBRID_SEARCH_ENABLED, HYBRID_CANDIDATES, HYBRID_MIN_BM25, RRF_K,
+    RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_K, BATCH_ANSWER_CONCURRENCY, CONTEXT_NEIGHBOR_WINDOW
 )
+from services.model_registry import get_embedding_service
+from services.vector_store import get_vector_store, insert_chunks
+from services.chunk_store import get_chunk_store
+from services.document_registry import (
+    STATUS_INDEXING, STATUS_READY, content_hash, get_document_registry
+)
+from services.pdf_extractor import PdfSource, count_pages, iter_pages
+from services.bulk_ingest import BatchInserter, Document, iter_documents
+from services.ingest_pipeline import IngestPipeline
+from services.lru_cache import TTLCache
+from services.lexical_index import LexicalBatch, get_lexical_index, reciprocal_rank_fusion
+from services.answer_cache import SemanticAnswerCache
+from services.reranker import CrossEncoderReranker
+from services.prompt_builder import PromptBuilder
+from services.llm_client import get_llm_client, streaming
+from services.corpus_state import (
+    bump_corpus_version, corpus_row_count, init_corpus_row_count, set_corpus_row_count
+)
+from services.text_chunker import TextChunker, create_chunker
+
+# 预处理使用的正则
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPECIAL_CHAR_RE = re.compile(r'[^\w\s\u4e00-\u9fff。，！？、：；（）【】《》""'']')
+
+
+def _format_scores(context: Dict[str, Any]) -> Dict[str, str]:
+    """返回给前端的得分字段，只包含该上下文实际具有的得分"""
+    return {key: f"{context[key]:.4f}" for key in ('similarity', 'bm25', 'rerank_score')
+            if context.get(key) is not None}
+
 
 class RAGService:
     def __init__(self):
         """初始化 RAG 服务"""
-        # 连接到 Milvus
-        connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+        # 共享的向量模型，首次使用时加载
+        self.embedder = get_embedding_service()
+        self._chunker = None
         
-        # 加载向量模型
-        self.model = SentenceTransformer(VECTOR_MODEL_NAME)
-        self.vector_dim = self.model.get_sentence_embedding_dimension()
+        # 查询向量缓存，重复问题不再经过向量模型
+        self.query_vector_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+        # 语义回答缓存，相似问题命中相同上下文时跳过大模型生成
+        self.answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
         
-        # 确保集合存在
-        self._ensure_collection()
-    
-    def _ensure_collection(self):
-        """确保集合存在并具有正确的结构"""
-        try:
-            print(f"检查集合 {COLLECTION_NAME} 是否存在...")
-            
-            if utility.has_collection(COLLECTION_NAME):
-                print(f"集合 {COLLECTION_NAME} 已存在")
-                
-                # 获取集合
-                collection = Collection(COLLECTION_NAME)
-                # 检查字段是否正确
-                schema = collection.schema
-                required_fields = {'id', 'content', 'embedding', 'source', 'page', 'chunk', 'total_pages'}
-                existing_fields = {field.name for field in schema.fields}
-                
-                if not required_fields.issubset(existing_fields):
-                    print(f"集合字段不完整，当前字段: {existing_fields}")
-                    print(f"缺少字段: {required_fields - existing_fields}")
-                    print("删除并重建集合...")
-                    
-                    utility.drop_collection(COLLECTION_NAME)
-                    print(f"已删除集合 {COLLECTION_NAME}")
-                else:
-                    print("集合字段验证通过")
-                    return
-            
-            # 创建集合
-            print(f"创建新集合: {COLLECTION_NAME}")
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.vector_dim),
-                FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=1024),
-                FieldSchema(name="page", dtype=DataType.INT64),
-                FieldSchema(name="chunk", dtype=DataType.INT64),
-                FieldSchema(name="total_pages", dtype=DataType.INT64)
-            ]
-            
-            schema = CollectionSchema(
-                fields=fields,
-                description=f"文档存储集合 {COLLECTION_NAME}",
-                enable_dynamic_field=True
-            )
-            
-            collection = Collection(
-                name=COLLECTION_NAME,
-                schema=schema,
-                using='default',
-                shards_num=2
-            )
-            
-            # 创建索引
-            print("创建向量索引...")
-            index_params = {
-                "metric_type": "L2",  # 使用 L2 距离
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 1024}
-            }
-            collection.create_index(
-                field_name="embedding",
-                index_params=index_params
-            )
-            print("向量索引创建完成")
-            
-            print(f"集合 {COLLECTION_NAME} 创建成功")
-            
-        except Exception as e:
-            print(f"确保集合存在时出错: {str(e)}")
-            raise
+        # 已导入文档的登记表
+        self.registry = get_document_registry()
+        # BM25 倒排索引，与向量检索结果融合，弥补型号、编号等精确匹配
+        self.lexical = get_lexical_index() if HYBRID_SEARCH_ENABLED else None
+        # CrossEncoder 重排，模型在首次查询时加载
+        self.reranker = CrossEncoderReranker() if RERANK_ENABLED else None
+        # 按 token 预算装入去重后的上下文
+        self.prompt_builder = PromptBuilder()
+        # 共享的大模型客户端，复用连接池中的长连接
+        self.llm = get_llm_client()
+        
+        # 进程内共享的向量存储（Milvus 或本地内存映射存储），只保存分块主键和向量，
+        # 记录数只在启动时读取一次，之后由导入和删除操作维护
+        self.store = get_vector_store()
+        # 分块文本和来源信息，检索后按主键读取
+        self.chunks = get_chunk_store()
+        init_corpus_row_count(self.store.count())
+
+    @property
+    def vector_dim(self) -> int:
+        return self.embedder.dimension
     
+    def _embed_query(self, query: str) -> np.ndarray:
+        """生成查询向量，按规范化后的查询文本缓存"""
+        key = ' '.join(query.lower().split())
+        query_vector = self.query_vector_cache.get(key)
+        if query_vector is None:
+            query_vector = self.embedder.encode_query(query, normalize=True)
+            self.query_vector_cache.put(key, query_vector)
+        return query_vector
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """批量生成查询向量，未缓存的查询在一次批量计算中完成"""
+        keys = [' '.join(query.lower().split()) for query in queries]
+        vectors: List[Optional[np.ndarray]] = [self.query_vector_cache.get(key) for key in keys]
+        # 同一批次内重复的查询只计算一次
+        missing = {keys[i]: i for i, vector in enumerate(vectors) if vector is None}
+        if missing:
+            encoded = self.embedder.encode_queries([queries[i] for i in missing.values()], normalize=True)
+            for key, vector in zip(missing, encoded):
+                self.query_vector_cache.put(key, vector)
+            encoded_by_key = dict(zip(missing, encoded))
+            vectors = [encoded_by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.asarray(vectors, dtype=np.float32)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """查询相关缓存的命中统计"""
+        stats = {'query_embedding': self.query_vector_cache.stats()}
+        if self.answer_cache is not None:
+            stats['answer'] = self.answer_cache.stats()
+        if self.lexical is not None:
+            stats['lexical_index'] = self.lexical.stats()
+        if self.reranker is not None:
+            stats['rerank'] = self.reranker.stats()
+        return stats
+
+    def _rerank_full_precision(self, query_vectors: np.ndarray,
+                               all_hits: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """用向量存储中写入时的 float32 向量重新计算候选距离，弥补量化索引带来的召回损失
+
+        所有查询的候选向量在一次读取中完成，查询时不调用向量模型。
+        """
+        vectors = self.store.get_vectors({hit['id'] for hits in all_hits for hit in hits})
+        reranked = []
+        for query_vector, hits in zip(query_vectors, all_hits):
+            hits = [hit for hit in hits if hit['id'] in vectors]
+            for hit in hits:
+                hit['distance'] = float(np.sum((vectors[hit['id']] - query_vector) ** 2))
+            reranked.append(sorted(hits, key=lambda hit: hit['distance']))
+        return reranked
+
+    def _hydrate(self, all_hits: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """从分块存储批量读取命中的文本和来源信息，分块存储中已不存在的命中被丢弃"""
+        records = self.chunks.get_many({hit['id'] for hits in all_hits for hit in hits})
+        return [[{**hit, **records[hit['id']]} for hit in hits if hit['id'] in records] for hits in all_hits]
+
+    def _search_many(self, query_vectors: np.ndarray, limit: int = 5,
+                     query_texts: Optional[List[Optional[str]]] = None) -> List[List[Dict[str, Any]]]:
+        """搜索多个查询的相似文本块，所有查询向量在一次向量存储检索中完成
+
+        启用混合检索且提供了查询文本时，向量检索与 BM25 检索各取 HYBRID_CANDIDATES
+        条候选，按倒数排名融合后取前 limit 条。只来自倒排索引的命中不再读取向量计算距离。
+        Returns:
+            每个查询按相关性排列的命中记录，包含文本、来源信息，以及 L2 距离 distance
+            或 BM25 得分 bm25（两路都命中时两者都有）
+        """
+        query_texts = query_texts or [None] * len(query_vectors)
+        hybrid = self.lexical is not None and any(query_texts)
+        dense_limit = max(limit, HYBRID_CANDIDATES) if hybrid else limit
+        # 只有索引返回的距离有损时才需要多取候选重排
+        rerank = self.store.lossy_distances and VECTOR_RERANK_CANDIDATES > dense_limit
+        candidates = VECTOR_RERANK_CANDIDATES if rerank else dense_limit
+        results = self.store.search(query_vectors, candidates)
+        if rerank:
+            results = self._rerank_full_precision(query_vectors, results)
+        lexical_results = [
+            self.lexical.search(query_text, HYBRID_CANDIDATES) if self.lexical is not None and query_text else []
+            for query_text in query_texts
+        ]
+        # 所有查询的向量候选和 BM25 候选在一次分块存储读取中补全文本
+        hydrated = self._hydrate([hits[:dense_limit] for hits in results] + lexical_results)
+        results, lexical_results = hydrated[:len(results)], hydrated[len(results):]
+
+        all_hits = []
+        for hits, lexical_hits in zip(results, lexical_results):
+            if lexical_hits:
+                hits = reciprocal_rank_fusion([hits, lexical_hits], RRF_K)
+            all_hits.append(hits[:limit])
+        return all_hits
+
+    def _retrieve_many(self, queries: List[str], query_vectors: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """检索并（启用时）重排，返回每个查询送入提示词的候选"""
+        if self.reranker is None:
+            return self._search_many(query_vectors, limit=5, query_texts=queries)
+        # 多取候选，由重排模型批量打分后只保留最相关的几条，缩短提示词
+        all_hits = self._search_many(query_vectors, limit=RERANK_CANDIDATES, query_texts=queries)
+        return [self.reranker.rerank(query, hits, RERANK_TOP_K) for query, hits in zip(queries, all_hits)]
+
+    def _expand_contexts(self, contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把同一文档中前后 CONTEXT_NEIGHBOR_WINDOW 个相邻分块拼接到上下文中，补全被分块切断的内容"""
+        if CONTEXT_NEIGHBOR_WINDOW <= 0:
+            return contexts
+        expanded = []
+        for context in contexts:
+            around = self.chunks.neighbors(context['source'], context['page'], context['chunk'],
+                                           CONTEXT_NEIGHBOR_WINDOW)
+            parts = [chunk['content'] for chunk in around['before']] + [context['content']] + \
+                [chunk['content'] for chunk in around['after']]
+            expanded.append({**context, 'content': '\n'.join(parts)})
+        return expanded
+
+    def _select_contexts(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """过滤相关性不足的命中，返回上下文列表
+
+        similarity 为 1 / (1 + L2 距离)，只来自倒排索引的命中没有向量距离，similarity 为 None，
+        按 BM25 得分过滤。
+        """
+        contexts = []
+        for hit in hits:
+            if not (hit['content'] and hit['source']):
+                continue
+            similarity = 1 / (1 + hit['distance']) if hit.get('distance') is not None else None
+            # 经过重排的结果已按重排得分过滤
+            if 'rerank_score' in hit or (similarity is not None and similarity > 0.3) \
+                    or hit.get('bm25', 0.0) > HYBRID_MIN_BM25:
+                contexts.append({**hit, 'similarity': similarity})
+        return contexts
+
+
+    @staticmethod
+    def _context_detail(context: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'content': context['content'],
+            'source': context['source'],
+            'page': context['page'],
+            'total_pages': context['total_pages'],
+            'chunk': context['chunk'],
+            **_format_scores(context)
+        }
+
+    @staticmethod
+    def _source_item(context: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'source': f"{context['source']} (第 {context['page']}/{context['total_pages']} 页)",
+            **_format_scores(context)
+        }
+
     def _preprocess_text(self, text: str) -> str:
         """预处理文本
         Args:
@@ -103,151 +229,140 @@ class RAGService:
             处理后的文本
         """
         # 移除多余的空白字符
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         # 移除特殊字符
-        text = re.sub(r'[^\w\s\u4e00-\u9fff。，！？、：；（）【】《》""'']', '', text)
+        text = _SPECIAL_CHAR_RE.sub('', text)
         return text.strip()
 
-    def _split_text(self, text: str, max_length: int = 500) -> List[str]:
+    @property
+    def chunker(self) -> TextChunker:
+        if self._chunker is None:
+            self._chunker = create_chunker(self.embedder, min_chars=50)  # 只保留有意义的块
+        return self._chunker
+
+    def _split_text(self, text: str, max_length: Optional[int] = None) -> List[str]:
         """将文本分割成适当大小的块
         Args:
             text: 要分割的文本
-            max_length: 每个块的最大长度
+            max_length: 每个块的最大长度，默认使用分块配置
         Returns:
             文本块列表
         """
         # 预处理文本
         text = self._preprocess_text(text)
+        chunker = self.chunker if max_length is None else create_chunker(self.embedder, max_length, min_chars=50)
+        return chunker.split_texts(text)
+
+    def _chunk_page_fn(self, source: str, total_pages: int) -> Callable[[int, str], List[Dict[str, Any]]]:
+        """生成把一页文本转换为待写入实体（不含向量）的函数"""
+        def chunk_page(page_num: int, text: str) -> List[Dict[str, Any]]:
+            print(f"处理 {source} 第 {page_num}/{total_pages} 页")
+            if not text.strip():
+                print(f"第 {page_num} 页没有文本内容")
+                return []
+            
+            # 分割文本
+            chunks = self._split_text(text)
+            print(f"第 {page_num} 页分割为 {len(chunks)} 个块")
+            return [
+                {
+                    'content': chunk,
+                    'source': source,
+                    'page': page_num,
+                    'chunk': chunk_num,
+                    'total_pages': total_pages
+                }
+                for chunk_num, chunk in enumerate(chunks, 1)
+                if chunk.strip()
+            ]
+        return chunk_page
+
+    def _lexical_batch(self) -> Optional[LexicalBatch]:
+        """为一次导入创建倒排索引批次，未启用混合检索时为 None"""
+        return self.lexical.batch() if self.lexical is not None else None
+
+    def _insert_fn(self, lexical: Optional[LexicalBatch]) -> Callable[[List[Dict[str, Any]]], List[int]]:
+        """生成写入函数：写入分块存储和向量存储，并把分块登记到本次导入的倒排索引批次"""
+        def insert_rows(rows: List[Dict[str, Any]]) -> List[int]:
+            chunk_ids = insert_chunks(self.store, rows)
+            if lexical is not None:
+                lexical.add(chunk_ids, rows)
+            return chunk_ids
+        return insert_rows
+
+    def _ingest_document(self, source: str, pdf: PdfSource, insert: Callable[[List[Dict[str, Any]]], Any],
+                         progress: Optional[Callable[..., None]] = None, mark_ready: bool = True) -> Dict[str, Any]:
+        """以流水线方式处理单个文档，不执行 flush
+
+        内容未变化的文档直接跳过；同名文档内容变化时先按来源删除旧数据，
+        耗时只与该文档的大小有关。
+        Args:
+            mark_ready: 是否在处理完成后把登记表状态置为已完成；
+                写入被缓冲时由调用方在写入完成后登记
+        Returns:
+            统计信息，包含总页数 pages、写入记录数 rows、内容哈希 hash 和是否跳过 skipped
+        """
+        digest = content_hash(pdf)
+        existing = self.registry.get(source)
+        if existing and existing['hash'] == digest and existing['status'] == STATUS_READY:
+            print(f"{source} 内容未变化，跳过导入")
+            return {'pages': existing['pages'], 'rows': existing['chunks'], 'hash': digest, 'skipped': True}
+        if existing:
+            print(f"{source} 已存在，删除旧数据后重新导入")
+            deleted = self._delete_source(source)
+            if deleted:
+                bump_corpus_version(f"替换 {source}", -deleted)
         
-        # 首先按段落分割
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-                
-            # 如果段落太长，按句子分割
-            if len(para) > max_length:
-                sentences = re.split(r'([。！？!?])', para)
-                i = 0
-                while i < len(sentences):
-                    if i + 1 < len(sentences):
-                        # 将句子和标点符号组合在一起
-                        sent = sentences[i] + sentences[i + 1]
-                        i += 2
-                    else:
-                        sent = sentences[i]
-                        i += 1
-                        
-                    sent = sent.strip()
-                    if not sent:
-                        continue
-                        
-                    # 如果当前块加上这个句子超过最大长度，保存当前块
-                    if current_length + len(sent) > max_length and current_chunk:
-                        chunk_text = ' '.join(current_chunk)
-                        if len(chunk_text.strip()) >= 50:  # 只保留有意义的块
-                            chunks.append(chunk_text)
-                        current_chunk = []
-                        current_length = 0
-                    
-                    current_chunk.append(sent)
-                    current_length += len(sent)
-            else:
-                # 如果当前块加上这个段落超过最大长度，保存当前块
-                if current_length + len(para) > max_length and current_chunk:
-                    chunk_text = ' '.join(current_chunk)
-                    if len(chunk_text.strip()) >= 50:  # 只保留有意义的块
-                        chunks.append(chunk_text)
-                    current_chunk = []
-                    current_length = 0
-                
-                current_chunk.append(para)
-                current_length += len(para)
+        total_pages = count_pages(pdf)
+        print(f"{source} 总页数: {total_pages}")
+        report = progress or (lambda **values: None)
+        report(pages_total=total_pages)
         
-        # 保存最后一个块
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            if len(chunk_text.strip()) >= 50:  # 只保留有意义的块
-                chunks.append(chunk_text)
+        # 写入前先登记，导入中断时重新导入会清理已写入的部分数据
+        self.registry.upsert(source, digest, total_pages, 0, STATUS_INDEXING)
         
-        return chunks
+        # 提取、分块、向量化、写入以流水线方式并行执行，按批次写入
+        pipeline = IngestPipeline(self._chunk_page_fn(source, total_pages), self.embedder, insert, progress=report)
+        stats = pipeline.run(iter_pages(pdf))
+        if mark_ready:
+            self.registry.upsert(source, digest, total_pages, stats['rows'], STATUS_READY)
+        return {'pages': total_pages, 'rows': stats['rows'], 'hash': digest, 'skipped': False}
 
-    def process_pdf(self, file_path: str) -> Dict[str, Any]:
+    def process_pdf(self, file_path: str, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
         """处理 PDF 文件
         Args:
             file_path: PDF 文件路径
+            progress: 进度回调，以关键字参数接收 pages_total、pages_done、
+                chunks_embedded、rows_inserted 等计数
         Returns:
             处理结果，包含分块数量等信息
         """
+        lexical = self._lexical_batch()
         try:
             print(f"开始处理 PDF 文件: {file_path}")
+            stats = self._ingest_document(os.path.basename(file_path), file_path, self._insert_fn(lexical), progress)
             
-            # 读取 PDF 文件
-            pdf_reader = PdfReader(file_path)
-            total_pages = len(pdf_reader.pages)
-            print(f"PDF 总页数: {total_pages}")
-            
-            # 准备数据
-            entities = []
-            
-            # 逐页处理
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                print(f"处理第 {page_num}/{total_pages} 页")
-                
-                # 提取文本
-                text = page.extract_text()
-                if not text.strip():
-                    print(f"第 {page_num} 页没有文本内容")
-                    continue
-                
-                # 分割文本
-                chunks = self._split_text(text)
-                print(f"第 {page_num} 页分割为 {len(chunks)} 个块")
-                
-                # 为每个块生成向量
-                for chunk_num, chunk in enumerate(chunks, 1):
-                    if not chunk.strip():
-                        continue
-                        
-                    # 生成向量
-                    embedding = self.model.encode(chunk, normalize_embeddings=True)  # 归一化向量
-                    
-                    # 准备实体数据
-                    entity = {
-                        'content': chunk,
-                        'source': os.path.basename(file_path),
-                        'page': page_num,
-                        'chunk': chunk_num,
-                        'total_pages': total_pages,
-                        'embedding': embedding.tolist()
-                    }
-                    entities.append(entity)
-                    
-                    print(f"处理块 {chunk_num}，长度: {len(chunk)}")
-            
-            print(f"向量生成完成，准备插入 {len(entities)} 条记录")
-            
-            # 获取集合
-            collection = Collection(COLLECTION_NAME)
+            if stats['skipped']:
+                return {
+                    'status': 'success',
+                    'pages': stats['pages'],
+                    'chunks': stats['rows'],
+                    'skipped': True
+                }
             
-            # 插入数据
-            if entities:
-                collection.insert(entities)
-                print(f"成功插入 {len(entities)} 条记录")
+            if stats['rows']:
+                print(f"成功插入 {stats['rows']} 条记录")
                 
                 # 确保数据可用
-                collection.flush()
-                collection.load()
+                self.store.flush()
+                if lexical is not None:
+                    lexical.commit()
+                bump_corpus_version(f"导入 {os.path.basename(file_path)}", stats['rows'])
                 
                 return {
                     'status': 'success',
-                    'pages': total_pages,
-                    'chunks': len(entities)
+                    'pages': stats['pages'],
+                    'chunks': stats['rows']
                 }
             else:
                 return {
@@ -261,33 +376,151 @@ class RAGService:
                 'status': 'error',
                 'message': str(e)
             }
+        finally:
+            # 导入失败时丢弃已登记但未写入倒排段的分块
+            if lexical is not None:
+                lexical.discard()
+
+    def ingest_documents(self, documents: Iterable[Document], workers: int = BULK_INGEST_WORKERS,
+                         progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """批量导入多个文档
+        
+        多个文档并行处理，写入跨文档合并为大批量插入，全部完成后只执行一次 flush。
+        Args:
+            documents: (文档名称, 文件路径或内容) 的迭代器
+            workers: 并行处理的文档数
+            progress: 进度回调，接收 files_done、files_failed、pages_done、chunks_embedded、rows_inserted
+        Returns:
+            导入结果，包含成功、失败的文档及写入记录数
+        """
+        report = progress or (lambda **values: None)
+        lexical = self._lexical_batch()
+        inserter = BatchInserter(self._insert_fn(lexical), BULK_INSERT_BATCH_SIZE)
+        lock = threading.Lock()
+        totals = {'files_done': 0, 'files_failed': 0, 'pages_done': 0, 'chunks_embedded': 0}
+        succeeded = []
+        failed = []
+        
+        def ingest(source: str, pdf: PdfSource):
+            # 各文档的进度计数转换为全局累计值
+            last = {'pages_done': 0, 'chunks_embedded': 0}
+            
+            def document_progress(**values):
+                with lock:
+                    for key in last:
+                        if key in values:
+                            totals[key] += values[key] - last[key]
+                            last[key] = values[key]
+                    snapshot = dict(totals)
+                report(rows_inserted=inserter.rows_inserted, **snapshot)
+            
+            try:
+                stats = self._ingest_document(source, pdf, inserter.add, document_progress, mark_ready=False)
+                with lock:
+                    totals['files_done'] += 1
+                    succeeded.append({'source': source, 'pages': stats['pages'], 'chunks': stats['rows'],
+                                      'hash': stats['hash'], 'skipped': stats['skipped']})
+            except Exception as e:
+                print(f"导入 {source} 失败: {str(e)}")
+                with lock:
+                    totals['files_failed'] += 1
+                    failed.append({'source': source, 'message': str(e)})
+            report(**totals)
+        
+        try:
+            # 限制同时在内存中的文档数量
+            slots = threading.BoundedSemaphore(max(1, workers) * 2)
+            sources = set()
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='bulk-ingest') as executor:
+                for source, pdf in documents:
+                    # 同名文档并行导入会互相删除对方写入的数据，只导入第一个
+                    if source in sources:
+                        print(f"导入 {source} 失败: 文档名称重复")
+                        with lock:
+                            totals['files_failed'] += 1
+                            failed.append({'source': source, 'message': '文档名称重复，已导入同名文档'})
+                        report(**totals)
+                        continue
+                    sources.add(source)
+                    slots.acquire()
+                    future = executor.submit(ingest, source, pdf)
+                    future.add_done_callback(lambda _: slots.release())
+            
+            rows = inserter.close()
+            if rows:
+                self.store.flush()
+                if lexical is not None:
+                    lexical.commit()
+                bump_corpus_version('批量导入', rows)
+        finally:
+            if lexical is not None:
+                lexical.discard()
+        # 全部写入完成后再登记，避免中断时登记表与集合不一致
+        for item in succeeded:
+            if not item['skipped']:
+                self.registry.upsert(item['source'], item['hash'], item['pages'], item['chunks'], STATUS_READY)
+        report(rows_inserted=rows, **totals)
+        print(f"批量导入完成: 成功 {len(succeeded)} 个，失败 {len(failed)} 个，写入 {rows} 条记录")
+        
+        return {
+            'status': 'success' if succeeded else 'error',
+            'message': '' if succeeded else '没有成功导入的文档',
+            'files': len(succeeded) + len(failed),
+            'succeeded': succeeded,
+            'failed': failed,
+            'chunks': rows
+        }
+
+    def ingest_path(self, path: str, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """批量导入 zip/tar 压缩包、目录或清单文件中的 PDF"""
+        print(f"开始批量导入: {path}")
+        return self.ingest_documents(iter_documents(path), progress=progress)
 
    
+    def list_documents(self, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """分页列出已导入的文档"""
+        return self.registry.list(page, page_size)
+
+    def _delete_source(self, source: str) -> int:
+        """删除某个来源的分块、向量和倒排记录，返回删除的分块数
+
+        先删除向量和倒排记录，最后删除分块；中途失败时分块仍在，重试删除或重新导入
+        仍能按来源找到全部主键，不会留下无法清理的向量。
+        """
+        chunk_ids = self.chunks.source_ids(source)
+        if chunk_ids:
+            self.store.delete(chunk_ids)
+            if self.lexical is not None:
+                self.lexical.delete(chunk_ids)
+            self.chunks.delete(chunk_ids)
+        return len(chunk_ids)
+
+    def delete_document(self, source: str) -> bool:
+        """按来源删除文档的全部分块，并在后台安排压缩
+        Returns:
+            是否找到了该文档
+        """
+        deleted = self._delete_source(source)
+        registered = self.registry.delete(source)
+        print(f"删除文档 {source}: {deleted} 条记录")
+        if deleted:
+            self.store.schedule_compaction()
+            bump_corpus_version(f"删除 {source}", -deleted)
+        return registered or deleted > 0
+
     def query(self, query: str):
         """查询相关文档并生成回答"""
         try:
             print(f"开始处理查询: {query}")
             
-            # 加载集合
-            collection = Collection(COLLECTION_NAME)
-            collection.load()
-            print(f"成功加载集合: {COLLECTION_NAME}")
-            
-            # 检查集合是否为空
-            try:
-                row_count = collection.num_entities
-                print(f"集合中的实体数量: {row_count}")
-                
-                if row_count == 0:
-                    print("集合为空，没有可查询的文档")
-                    yield f"data: {json.dumps({'sources': [], 'contexts': []}, ensure_ascii=False)}\n\n"
-                    yield f"data: {json.dumps({'answer': '集合中还没有任何文档，请先上传一些 PDF 文件。'}, ensure_ascii=False)}\n\n"
-                    yield "data: [DONE]\n\n"
-                    return
-            except Exception as e:
-                print(f"获取集合统计信息失败: {str(e)}")
+            # 记录数取自本地缓存，查询过程只请求一次向量存储检索（量化索引另需一次读取原始向量重排）
+            if corpus_row_count() == 0:
+                # 集合可能由其他进程（如命令行批量导入）写入，为空时重新读取一次
+                set_corpus_row_count(self.store.count())
+            if corpus_row_count() == 0:
+                print("集合为空，没有可查询的文档")
                 yield f"data: {json.dumps({'sources': [], 'contexts': []}, ensure_ascii=False)}\n\n"
-                yield f"data: {json.dumps({'error': f'获取集合信息失败: {str(e)}'}, ensure_ascii=False)}\n\n"
+                yield f"data: {json.dumps({'answer': '集合中还没有任何文档，请先上传一些 PDF 文件。'}, ensure_ascii=False)}\n\n"
                 yield "data: [DONE]\n\n"
                 return
 
@@ -295,54 +528,14 @@ class RAGService:
             query = self._preprocess_text(query)
             
             # 生成查询向量
-            query_vector = self.model.encode(query, normalize_embeddings=True)
+            query_vector = self._embed_query(query)
             print(f"生成查询向量，维度: {len(query_vector)}")
             
             # 搜索相似文档
-            search_params = {
-                "metric_type": "L2",
-                "params": {"nprobe": 10},
-            }
-            
-            results = collection.search(
-                data=[query_vector.tolist()],
-                anns_field="embedding",
-                param=search_params,
-                limit=5,
-                output_fields=["content", "source", "page", "chunk", "total_pages"]
-            )
+            hits = self._retrieve_many([query], np.asarray([query_vector]))[0]
             
-            # 提取相关文档内容
-            contexts = []
-            sources = []
-            scores = []
-            context_details = []
-            
-            for hits in results:
-                for hit in hits:
-                    content = hit.entity.get('content')
-                    source = hit.entity.get('source')
-                    page = hit.entity.get('page')
-                    chunk = hit.entity.get('chunk')
-                    total_pages = hit.entity.get('total_pages')
-                    score = hit.score
-                    
-                    if content and source:
-                        similarity = 1 / (1 + score)
-                        if similarity > 0.3:
-                            contexts.append(content)
-                            source_info = f"{source} (第 {page}/{total_pages} 页)"
-                            sources.append(source_info)
-                            scores.append(similarity)
-                            
-                            context_details.append({
-                                'content': content,
-                                'source': source,
-                                'page': page,
-                                'total_pages': total_pages,
-                                'chunk': chunk,
-                                'similarity': f"{similarity:.4f}"
-                            })
+            # 提取相关文档内容（检索结果已按相关性排列）
+            contexts = self._select_contexts(hits)
 
             if not contexts:
                 yield f"data: {json.dumps({'sources': [], 'contexts': []}, ensure_ascii=False)}\n\n"
@@ -351,58 +544,37 @@ class RAGService:
                 yield "data: [DONE]\n\n"
                 return
             
-            # 按相关性排序
-            context_items = list(zip(contexts, sources, scores, context_details))
-            context_items.sort(key=lambda x: float(x[2]), reverse=True)
-            contexts, sources, scores, context_details = zip(*context_items)
-
-
-            # 将来源和分数打包在一起
-            source_items = []
-            for source, score in zip(sources, scores):
-                source_items.append({
-                    'source': source,
-                    'similarity': f"{score:.4f}"
-                })
+            # 在 token 预算内装入（按需补充相邻分块并）去重后的上下文，来源只列出实际使用的上下文
+            contexts = self._expand_contexts(contexts)
+            messages, contexts, prompt_tokens = self.prompt_builder.build(query, contexts)
+            context_ids = [context['id'] for context in contexts]
             
             # 先发送来源和上下文信息
             initial_data = {
-                'sources': source_items,
-                'contexts': context_details
+                'sources': [self._source_item(context) for context in contexts],
+                'contexts': [self._context_detail(context) for context in contexts],
+                'prompt_tokens': prompt_tokens
             }
             yield f"data: {json.dumps(initial_data, ensure_ascii=False)}\n\n"
 
+            # 相似问题检索到相同上下文时直接重放缓存的回答
+            if self.answer_cache is not None:
+                cached_events = self.answer_cache.get(query_vector, context_ids)
+                if cached_events is not None:
+                    for chunk in cached_events:
+                        yield chunk
+                    yield "data: [DONE]\n\n"
+                    return
             
-            # 构建提示
-            prompt = f"""基于以下文档内容回答用户的问题。如果无法从文档中找到答案，请说明无法回答。
-                如果文档内容与问题相关，请详细解释。如果不相关，请明确指出。
-
-                文档内容：
-                {' '.join(contexts)}
-
-                用户问题：{query}
-
-                请提供准确、详细的回答："""
-            
-            # 构建请求数据
-            request_data = {
-                "model": QWEN_MODEL,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "stream": True
-            }
-            
-            response = requests.post(
-                QWEN_API_URL,
-                json=request_data,
-                stream=True
-            )
-            response.raise_for_status()
-            
-            # 然后发送回答流
-            for chunk in self.generate_answer(response):
-                yield chunk
+            # system 前缀固定以复用 KV 缓存
+            with streaming(self.llm.chat('rag', messages, stream=True)) as response:
+                # 然后发送回答流，完整生成的回答写入语义缓存
+                answer_events = []
+                for chunk in self.generate_answer(response):
+                    answer_events.append(chunk)
+                    yield chunk
+                if self.answer_cache is not None and answer_events:
+                    self.answer_cache.put(query_vector, context_ids, answer_events)
             
             # 最后发送完成标记
             yield "data: [DONE]\n\n"
@@ -413,6 +585,63 @@ class RAGService:
             yield f"data: {json.dumps({'error': f'查询处理失败: {str(e)}'}, ensure_ascii=False)}\n\n"
             yield "data: [DONE]\n\n"
 
+    def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """非流式调用 Qwen，返回完整回答"""
+        response = self.llm.chat('rag', messages, stream=False)
+        return response.json().get('message', {}).get('content', '')
+
+    def query_batch(self, queries: List[str], answer: bool = False,
+                    concurrency: int = BATCH_ANSWER_CONCURRENCY) -> List[Dict[str, Any]]:
+        """批量查询
+
+        所有查询的向量在一次批量计算中生成，并在一次向量存储检索中完成；
+        需要回答时以有限并发调用大模型。
+        Args:
+            queries: 查询文本列表
+            answer: 是否生成回答
+            concurrency: 同时生成回答的数量
+        Returns:
+            与输入顺序一致的结果，包含 query、sources、contexts；需要回答时 sources、contexts
+            只包含装入提示词的上下文，并包含 prompt_tokens 和 answer 或 error
+        """
+        if not queries:
+            return []
+        texts = [self._preprocess_text(query) for query in queries]
+        query_vectors = self._embed_queries(texts)
+        all_hits = self._retrieve_many(texts, query_vectors)
+        print(f"批量检索完成: {len(queries)} 个查询")
+
+        results = []
+        batch_messages = []
+        for query, text, hits in zip(queries, texts, all_hits):
+            contexts = self._select_contexts(hits)
+            result = {'query': query}
+            messages = None
+            if answer and contexts:
+                messages, contexts, result['prompt_tokens'] = self.prompt_builder.build(
+                    text, self._expand_contexts(contexts))
+            result['sources'] = [self._source_item(context) for context in contexts]
+            result['contexts'] = [self._context_detail(context) for context in contexts]
+            results.append(result)
+            batch_messages.append(messages)
+
+        if answer:
+            def generate(index: int):
+                result = results[index]
+                if batch_messages[index] is None:
+                    result['answer'] = "抱歉，我没有找到与您问题相关的内容。"
+                    return
+                try:
+                    result['answer'] = self._complete(batch_messages[index])
+                except Exception as e:
+                    print(f"生成回答失败: {str(e)}")
+                    result['error'] = str(e)
+
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch-answer') as executor:
+                list(executor.map(generate, range(len(results))))
+
+        return results
+
     def empty_generator(self, message: str = "抱歉，我没有找到相关的文档内容。"):
         """返回空结果的生成器
         Args:
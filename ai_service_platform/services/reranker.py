@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Any, Dict, List
+from config import (
+    RERANK_MODEL_NAME, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE, RERANK_MIN_SCORE
+)
+from services.lru_cache import TTLCache
+
+
+class CrossEncoderReranker:
+    """CrossEncoder 重排
+
+    对 (查询, 分块) 对打分，未缓存的候选在一次批量前向计算中完成，
+    得分按规范化后的查询文本与分块 id 缓存。
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, batch_size: int = RERANK_BATCH_SIZE,
+                 min_score: float = RERANK_MIN_SCORE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.min_score = min_score
+        self.cache = TTLCache(RERANK_CACHE_SIZE)
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from services.model_registry import get_reranker_model
+            self._model = get_reranker_model(self.model_name)
+        return self._model
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """按重排得分降序返回得分不低于 min_score 的前 top_k 条，得分写入 rerank_score"""
+        if not hits:
+            return []
+        query_key = ' '.join(query.lower().split())
+        scores = [self.cache.get((query_key, hit['id'])) for hit in hits]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            # CrossEncoder 单输出时默认经过 sigmoid，得分在 0~1 之间
+            predicted = self.model.predict([(query, hits[i]['content']) for i in missing],
+                                           batch_size=self.batch_size, show_progress_bar=False)
+            for i, score in zip(missing, np.atleast_1d(predicted)):
+                scores[i] = float(score)
+                self.cache.put((query_key, hits[i]['id']), scores[i])
+
+        ranked = sorted(
+            ({**hit, 'rerank_score': score} for hit, score in zip(hits, scores) if score >= self.min_score),
+            key=lambda hit: hit['rerank_score'],
+            reverse=True
+        )
+        return ranked[:top_k]
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
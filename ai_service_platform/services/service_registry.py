@@ -0,0 +1,115 @@
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from config import WARMUP_SERVICES, LLM_PRELOAD_ROUTES
+
+# 启动耗时记录：阶段名称 -> 秒数
+STARTUP_TIMINGS: Dict[str, float] = {}
+
+
+def record_startup(name: str, seconds: float):
+    STARTUP_TIMINGS[name] = round(seconds, 3)
+    print(f"启动阶段 {name} 耗时 {seconds:.3f}s")
+
+
+@contextmanager
+def startup_timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup(name, time.perf_counter() - start)
+
+
+class LazyService:
+    """延迟初始化的服务
+
+    第一次访问属性时才导入模块并创建实例，多线程下只创建一次；
+    属性访问会转发给实际的服务实例。
+    """
+
+    def __init__(self, name: str, module: str, class_name: str):
+        self._name = name
+        self._module = module
+        self._class_name = class_name
+        self._instance = None
+        self._lock = threading.Lock()
+        self._state = 'pending'
+        self._error: Optional[str] = None
+
+    def get(self):
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                self._state = 'loading'
+                try:
+                    with startup_timer(f"{self._name}.import"):
+                        module = importlib.import_module(self._module)
+                    with startup_timer(f"{self._name}.init"):
+                        self._instance = getattr(module, self._class_name)()
+                    self._state = 'ready'
+                    self._error = None
+                except Exception as e:
+                    self._state = 'error'
+                    self._error = str(e)
+                    print(f"服务 {self._name} 初始化失败: {str(e)}")
+                    raise
+        return self._instance
+
+    @property
+    def status(self) -> Dict[str, Optional[str]]:
+        return {'state': self._state, 'error': self._error}
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+
+_services: Dict[str, LazyService] = {
+    'vector': LazyService('vector', 'services.vector_service', 'VectorService'),
+    'rag': LazyService('rag', 'services.rag_service', 'RAGService'),
+    'agent': LazyService('agent', 'services.agent_service', 'AgentService'),
+    'speech': LazyService('speech', 'services.speech_service', 'SpeechService'),
+    'chat': LazyService('chat', 'services.chat_service', 'ChatService'),
+}
+
+
+def get_service(name: str) -> LazyService:
+    """获取延迟初始化的服务代理"""
+    return _services[name]
+
+
+def warm_up(names: Optional[List[str]] = None) -> threading.Thread:
+    """在后台线程中依次初始化服务并预加载大模型，不阻塞应用启动"""
+    names = names if names is not None else WARMUP_SERVICES
+
+    def run():
+        start = time.perf_counter()
+        for name in names:
+            try:
+                _services[name].get()
+            except Exception:
+                continue
+        if LLM_PRELOAD_ROUTES:
+            from services.prompt_templates import preload
+            with startup_timer('llm.preload'):
+                preload(LLM_PRELOAD_ROUTES)
+        record_startup('warmup.total', time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, name='service-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, object]:
+    """各服务的初始化状态与启动耗时"""
+    services = {name: service.status for name, service in _services.items()}
+    return {
+        'ready': all(services[name]['state'] == 'ready' for name in WARMUP_SERVICES if name in services),
+        'services': services,
+        'startup': dict(STARTUP_TIMINGS)
+    }
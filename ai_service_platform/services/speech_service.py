@@ -3,26 +3,17 @@ import json
 import time
 import wave
 import ssl
-import requests
 from typing import Optional
 import websocket
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from config import FUNASR_API_URL, QWEN_API_URL, AUDIO_UPLOAD_FOLDER, QWEN_MODEL
+from config import FUNASR_API_URL, AUDIO_UPLOAD_FOLDER
+from services.prompt_templates import build_messages
+from services.llm_client import get_llm_client, streaming
 
 class SpeechService:
     def __init__(self):
         os.makedirs(AUDIO_UPLOAD_FOLDER, exist_ok=True)
-        # 配置带有重试机制的会话
-        self.session = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["POST"]
-        )
-        self.session.mount('http://', HTTPAdapter(max_retries=retries))
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
+        # 共享的大模型客户端，连接池与重试策略统一配置
+        self.client = get_llm_client()
 
     def transcribe_audio(self, audio_path: str) -> str:
         """使用 FunASR WebSocket 转写音频文件"""
@@ -106,60 +97,42 @@ class SpeechService:
     def summarize_text(self, text: str) -> str:
         """使用 Qwen 2.5 总结文本"""
         try:
-            # 构建请求数据
-            system_prompt = "请对以下文本进行简要总结，突出重点内容。"
-            request_data = {
-                "model": QWEN_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
-                "stream": True
-            }
-            
-            # 发送请求到 Qwen API
-            response = requests.post(
-                QWEN_API_URL,
-                json=request_data,
-                stream=True,
-                timeout=60
-            )
-            response.raise_for_status()
-      
-            # 用于累积完整的回复
-            full_response = ""             
-            # 处理流式响应
-            for line in response.iter_lines():
-                if not line:
-                    continue
-                    
-                try:
-                    # 解码二进制数据
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('b\''):
-                        # 去除b''
-                        line_str = line_str[2:-1]
-                        # 处理转义字符
-                        line_str = bytes(line_str, 'utf-8').decode('unicode_escape')
-                    
-                    # 解析JSON
-                    data = json.loads(line_str)
-                    print(f"收到数据行: {data}")  # 调试日志
-                    
-                    if data.get('done', False):
-                        break
-                        
-                    if 'message' in data:
-                        content = data['message'].get('content', '')
-                        if content:
-                            full_response += content
-                            
-                except json.JSONDecodeError as e:
-                    print(f"JSON解析错误: {str(e)}, 原始数据: {line}")
-                    continue
-                except Exception as e:
-                    print(f"处理响应行时出错: {str(e)}, 原始数据: {line}")
-                    continue
+            # 发送请求到 Qwen API，总结指令在固定的 system 前缀中
+            with streaming(self.client.chat('summarize', build_messages('summarize', text), stream=True)) as response:
+                # 用于累积完整的回复
+                full_response = ""             
+                # 处理流式响应
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+
+                    try:
+                        # 解码二进制数据
+                        line_str = line.decode('utf-8')
+                        if line_str.startswith('b\''):
+                            # 去除b''
+                            line_str = line_str[2:-1]
+                            # 处理转义字符
+                            line_str = bytes(line_str, 'utf-8').decode('unicode_escape')
+
+                        # 解析JSON
+                        data = json.loads(line_str)
+                        print(f"收到数据行: {data}")  # 调试日志
+
+                        if data.get('done', False):
+                            break
+
+                        if 'message' in data:
+                            content = data['message'].get('content', '')
+                            if content:
+                                full_response += content
+
+                    except json.JSONDecodeError as e:
+                        print(f"JSON解析错误: {str(e)}, 原始数据: {line}")
+                        continue
+                    except Exception as e:
+                        print(f"处理响应行时出错: {str(e)}, 原始数据: {line}")
+                        continue
 
             if not full_response:
                 raise ValueError("未收到有效的总结结果")
@@ -192,20 +165,9 @@ class SpeechService:
     def get_ai_response(self, text: str) -> str:
         """获取 AI 回复"""
         try:
-            response = self.session.post(
-                QWEN_API_URL,
-                json={
-                    "model": "qwen2.5",
-                    "messages": [
-                        {"role": "user", "content": text}
-                    ],
-                    "stream": False
-                },
-                timeout=(5, 60)
-            )
-            response.raise_for_status()
+            response = self.client.chat('chat', build_messages('chat', text), stream=False)
             result = response.json()
-            return result['choices'][0]['message']['content']
+            return result['message']['content']
         except Exception as e:
             print(f"获取AI回复失败: {str(e)}")
             raise
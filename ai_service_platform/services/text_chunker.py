@@ -0,0 +1,126 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from config import CHUNK_LENGTH_UNIT, CHUNK_MAX_LENGTH, CHUNK_OVERLAP
+
+# 句子边界：中英文句末标点（可带右引号/括号）或换行；英文句点后需跟空白，避免切开小数
+_BOUNDARY_RE = re.compile(r'(?:[。！？!?]+|\.(?=\s))[”’"\'」』》）)]*|\n+')
+
+
+class TextChunker:
+    """文本分块引擎
+
+    先按句子边界切分，再按长度贪心合并为分块。长度可以按向量模型分词器的 token 数
+    或字符数计算；超长句子按长度均分。分块内容直接从原文切片得到，
+    并返回在输入文本中的字符偏移，整个过程与文本长度成线性关系。
+    """
+
+    def __init__(self, max_length: int, overlap: int = CHUNK_OVERLAP, min_chars: int = 0,
+                 tokenizer=None):
+        """
+        Args:
+            max_length: 每个分块的最大长度（token 数或字符数）
+            overlap: 相邻分块重叠的长度，不超过 max_length 的一半
+            min_chars: 去除首尾空白后少于该字符数的分块会被丢弃
+            tokenizer: Hugging Face 分词器，为空时按字符计数
+        """
+        self.max_length = max(1, max_length)
+        self.overlap = max(0, min(overlap, self.max_length // 2))
+        self.min_chars = min_chars
+        self.tokenizer = tokenizer
+
+    def _segments(self, text: str) -> List[Tuple[int, int]]:
+        """按句子边界切分，返回各句在原文中的 [start, end) 区间"""
+        segments = []
+        start = 0
+        for match in _BOUNDARY_RE.finditer(text):
+            end = match.end()
+            if text[start:end].strip():
+                segments.append((start, end))
+            start = end
+        if start < len(text) and text[start:].strip():
+            segments.append((start, len(text)))
+        return segments
+
+    def measure(self, texts: List[str]) -> List[int]:
+        """批量计算文本长度"""
+        if self.tokenizer is None:
+            return [len(text) for text in texts]
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_attention_mask=False,
+                                 return_token_type_ids=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def _units(self, text: str) -> List[Tuple[int, int, int]]:
+        """生成 (start, end, length) 单元，超长句子按长度均分"""
+        segments = self._segments(text)
+        if not segments:
+            return []
+        lengths = self.measure([text[start:end] for start, end in segments])
+
+        units = []
+        for (start, end), length in zip(segments, lengths):
+            if length <= self.max_length:
+                units.append((start, end, length))
+                continue
+            pieces = -(-length // self.max_length)
+            step = -(-(end - start) // pieces)
+            for piece_start in range(start, end, step):
+                piece_end = min(piece_start + step, end)
+                units.append((piece_start, piece_end, -(-length * (piece_end - piece_start) // (end - start))))
+        return units
+
+    def _make_chunk(self, text: str, start: int, end: int, length: int) -> Optional[Dict[str, Any]]:
+        content = text[start:end]
+        stripped = content.strip()
+        if not stripped or len(stripped) < self.min_chars:
+            return None
+        start += len(content) - len(content.lstrip())
+        return {'text': stripped, 'start': start, 'end': start + len(stripped), 'length': length}
+
+    def split(self, text: str) -> List[Dict[str, Any]]:
+        """分块
+        Returns:
+            分块列表，每项包含 text、start、end（在输入文本中的字符偏移）和 length
+        """
+        units = self._units(text)
+        chunks = []
+        window_start = 0
+        total = 0
+
+        for index, (_, _, length) in enumerate(units):
+            if total + length > self.max_length and index > window_start:
+                chunk = self._make_chunk(text, units[window_start][0], units[index - 1][1], total)
+                if chunk:
+                    chunks.append(chunk)
+
+                # 从窗口末尾回退若干句作为下一个分块的重叠部分
+                next_start = index
+                total = 0
+                while next_start - 1 > window_start and total + units[next_start - 1][2] <= self.overlap:
+                    next_start -= 1
+                    total += units[next_start][2]
+                window_start = next_start
+            total += length
+
+        if window_start < len(units):
+            chunk = self._make_chunk(text, units[window_start][0], units[-1][1], total)
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def split_texts(self, text: str) -> List[str]:
+        """分块并只返回文本"""
+        return [chunk['text'] for chunk in self.split(text)]
+
+
+
+def create_chunker(embedder, max_length: Optional[int] = None, min_chars: int = 0) -> TextChunker:
+    """按配置创建分块器
+
+    按 token 计数时使用向量模型的分词器，最大长度不超过模型的最大序列长度，
+    避免分块在生成向量时被截断。
+    """
+    if CHUNK_LENGTH_UNIT == 'token':
+        limit = embedder.max_seq_length
+        max_length = min(max_length or CHUNK_MAX_LENGTH or limit, limit)
+        return TextChunker(max_length, CHUNK_OVERLAP, min_chars, tokenizer=embedder.tokenizer)
+    return TextChunker(max_length or CHUNK_MAX_LENGTH or 500, CHUNK_OVERLAP, min_chars)
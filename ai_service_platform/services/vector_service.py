@@ -1,145 +1,77 @@
-from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
-from sentence_transformers import SentenceTransformer
-import PyPDF2
-import torch
+import os
 import re
-import jieba
-from config import MILVUS_HOST, MILVUS_PORT, COLLECTION_NAME, VECTOR_DIM, VECTOR_MODEL_NAME
+from services.model_registry import get_embedding_service
+from services.vector_store import get_vector_store, insert_chunks
+from services.text_chunker import create_chunker
+from services.pdf_extractor import iter_pages
+from services.corpus_state import bump_corpus_version
+
+# 文本清理使用的正则
+_CONTROL_CHAR_RE = re.compile(r'[^\u4e00-\u9fff\u3000-\u303f\uff00-\uff60\x20-\x7e\n]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_BLANK_LINE_RE = re.compile(r'\n\s*\n')
 
 class VectorService:
     def __init__(self):
-        self.model = SentenceTransformer(VECTOR_MODEL_NAME)
-        self.connect_milvus()
-        self.collection = self.ensure_collection()
-
-    def connect_milvus(self):
-        """Connect to Milvus server"""
-        connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
-
-    def ensure_collection(self):
-        """Create collection if it doesn't exist"""
-        try:
-            if utility.has_collection(COLLECTION_NAME):
-                print(f"\n删除已存在的集合: {COLLECTION_NAME}")
-                utility.drop_collection(COLLECTION_NAME)
-                
-            print(f"\n创建新集合: {COLLECTION_NAME}")
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=VECTOR_DIM)
-            ]
-            schema = CollectionSchema(fields=fields, description="Document store")
-            collection = Collection(name=COLLECTION_NAME, schema=schema)
-            
-            # 创建索引
-            print("\n创建索引...")
-            index_params = {
-                "metric_type": "L2",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 1024}
-            }
-            collection.create_index(field_name="embedding", index_params=index_params)
-            print("索引创建完成")
-            
-            return collection
-            
-        except Exception as e:
-            print(f"\n创建集合时出错: {str(e)}")
-            raise
+        self.embedder = get_embedding_service()
+        self._chunker = None
+        # 与 RAGService 共享的向量存储，后端由 VECTOR_STORE_BACKEND 选择
+        self.store = get_vector_store()
 
     def clean_text(self, text):
         """清理文本，移除特殊字符和多余的空白"""
         # 移除控制字符和特殊字符，但保留中文标点
-        text = re.sub(r'[^\u4e00-\u9fff\u3000-\u303f\uff00-\uff60\x20-\x7e\n]', '', text)
+        text = _CONTROL_CHAR_RE.sub('', text)
         
         # 规范化中文标点
         text = text.replace('：', ':').replace('；', ';').replace('"', '"').replace('"', '"')
         
         # 替换多个空白字符为单个空格
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         
         # 移除空行
-        text = re.sub(r'\n\s*\n', '\n', text)
+        text = _BLANK_LINE_RE.sub('\n', text)
         
         return text.strip()
 
-    def split_text(self, text, max_length=800):
-        """智能分割中文文本"""
-        # 定义句子结束符模式
-        sentence_pattern = (
-            r'(?<=[。！？.!?])'  # 句号、感叹号、问号后面
-            r'|(?<=[。！？.!?]["\'』」』》])'  # 带引号的句子结束
-            r'|(?<=\n)'  # 换行符
-        )
-        
-        # 分割句子
-        sentences = re.split(sentence_pattern, text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            # 如果单个句子超过最大长度，使用结巴分词进一步分割
-            if len(sentence) > max_length:
-                words = list(jieba.cut(sentence))
-                temp = ""
-                for word in words:
-                    if len(temp) + len(word) < max_length:
-                        temp += word
-                    else:
-                        if temp:
-                            chunks.append(temp)
-                        temp = word
-                if temp:
-                    chunks.append(temp)
-            else:
-                # 尝试将句子添加到当前块
-                if len(current_chunk) + len(sentence) < max_length:
-                    current_chunk += sentence
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    current_chunk = sentence
-        
-        # 添加最后一个块
-        if current_chunk:
-            chunks.append(current_chunk)
+    def split_text(self, text, max_length=None):
+        """智能分割中文文本，按向量模型的 token 数控制分块长度"""
+        if max_length is None:
+            if self._chunker is None:
+                self._chunker = create_chunker(self.embedder, min_chars=31)
+            chunker = self._chunker
+        else:
+            chunker = create_chunker(self.embedder, max_length, min_chars=31)
         
         # 过滤太短的文本块
-        return [chunk for chunk in chunks if len(chunk.strip()) > 30]
+        return chunker.split_texts(text)
 
     def extract_text_from_pdf(self, pdf_path):
         """Extract text from PDF file"""
         text_chunks = []
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    try:
-                        # 提取文本
-                        text = page.extract_text()
-                        if not text:
-                            print(f"页面 {page_num} 未提取到文本")
-                            continue
-                            
-                        # 清理文本
-                        text = self.clean_text(text)
-                        if not text:
-                            print(f"页面 {page_num} 清理后无有效文本")
-                            continue
-                            
-                        # 分割文本
-                        chunks = self.split_text(text)
-                        text_chunks.extend(chunks)
-                        print(f"页面 {page_num} 提取了 {len(chunks)} 个文本块")
+            # 多进程并行提取文本，结果按页码顺序返回
+            for page_num, text in iter_pages(pdf_path):
+                try:
+                    if not text:
+                        print(f"页面 {page_num} 未提取到文本")
+                        continue
                         
-                    except Exception as e:
-                        print(f"处理页面 {page_num} 时出错: {str(e)}")
+                    # 清理文本
+                    text = self.clean_text(text)
+                    if not text:
+                        print(f"页面 {page_num} 清理后无有效文本")
                         continue
                         
+                    # 分割文本
+                    chunks = self.split_text(text)
+                    text_chunks.extend(chunks)
+                    print(f"页面 {page_num} 提取了 {len(chunks)} 个文本块")
+                    
+                except Exception as e:
+                    print(f"处理页面 {page_num} 时出错: {str(e)}")
+                    continue
+                        
         except Exception as e:
             print(f"读取PDF文件时出错: {str(e)}")
             raise
@@ -157,71 +89,65 @@ class VectorService:
     def generate_embeddings(self, texts):
         """Generate embeddings for text chunks"""
         try:
-            # 批量处理以避免内存问题
-            batch_size = 32
-            all_embeddings = []
-            
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                embeddings = self.model.encode(batch, convert_to_tensor=True)
-                all_embeddings.extend(embeddings.cpu().numpy().tolist())
-                print(f"已处理 {min(i + batch_size, len(texts))}/{len(texts)} 个文本块")
-            
-            return all_embeddings
+            # 按长度分桶批量处理，避免内存问题并减少 padding
+            return self.embedder.encode(texts, normalize=False)
             
         except Exception as e:
             print(f"生成向量嵌入时出错: {str(e)}")
             raise
 
-    def insert_to_milvus(self, texts, embeddings):
+    def insert_to_milvus(self, texts, embeddings, source=''):
         """Insert text and embeddings into Milvus"""
         try:
             print(f"\n准备插入数据到 Milvus:")
             print(f"文本数量: {len(texts)}")
             print(f"向量数量: {len(embeddings)}")
-            if embeddings:
+            if len(embeddings):
                 print(f"向量维度: {len(embeddings[0])}")
             
             # 验证数据
-            if not texts or not embeddings:
+            if not texts or not len(embeddings):
                 raise ValueError("文本或向量为空")
             if len(texts) != len(embeddings):
                 raise ValueError(f"文本数量 ({len(texts)}) 与向量数量 ({len(embeddings)}) 不匹配")
             
-            # 获取集合
-            print(f"\n当前集合信息:")
-            print(f"名称: {self.collection.name}")
-            print(f"行数: {self.collection.num_entities}")
-            print(f"架构: {self.collection.schema}")
+            # 获取向量存储
+            print(f"\n当前向量存储信息:")
+            print(f"后端: {self.store.name}")
+            print(f"行数: {self.store.count()}")
             
             # 准备数据
             entities = [
-                texts,      # content field
-                embeddings  # embedding field
+                {
+                    'content': text,
+                    'embedding': embedding,
+                    'source': source,
+                    'page': 0,
+                    'chunk': chunk_num,
+                    'total_pages': 0
+                }
+                for chunk_num, (text, embedding) in enumerate(zip(texts, embeddings), 1)
             ]
             
             # 插入数据
             print("\n开始插入数据...")
-            insert_result = self.collection.insert(entities)
+            inserted_ids = insert_chunks(self.store, entities)
             print(f"插入结果:")
-            print(f"插入ID: {insert_result.primary_keys}")
+            print(f"插入ID: {inserted_ids}")
             
-            # 确保数据持久化
+            # 确保数据持久化，刷新后即可检索
             print("\n刷新数据...")
-            self.collection.flush()
+            self.store.flush()
+            bump_corpus_version(f"写入 {source}" if source else '写入文档', len(entities))
             
             # 验证插入结果
             print("\n验证插入结果:")
-            new_count = self.collection.num_entities
+            new_count = self.store.count()
             print(f"当前集合实体数: {new_count}")
             
             if new_count == 0:
                 raise ValueError("插入后集合仍为空")
             
-            # 加载集合以供搜索
-            print("\n加载集合...")
-            self.collection.load()
-            
             return new_count
             
         except Exception as e:
@@ -253,7 +179,7 @@ class VectorService:
             
             print("\n开始存储到向量数据库...")
             # Store in Milvus
-            inserted_count = self.insert_to_milvus(text_chunks, embeddings)
+            inserted_count = self.insert_to_milvus(text_chunks, embeddings, os.path.basename(pdf_path))
             print(f"成功存储了 {inserted_count} 个文档")
             
             return inserted_count
@@ -0,0 +1,577 @@
+import os
+import json
+import math
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from config import (
+    VECTOR_DIM, VECTOR_STORE_BACKEND, COMPACTION_DELAY,
+    LOCAL_VECTOR_DIR, LOCAL_VECTOR_DTYPE, LOCAL_INDEX_TYPE, LOCAL_IVF_NLIST, LOCAL_IVF_NPROBE,
+    LOCAL_IVF_MIN_ROWS, LOCAL_COMPACT_RATIO
+)
+
+# 按主键删除或读取时每条表达式包含的主键数
+_ID_BATCH = 1000
+
+# 精确搜索、聚类分配和压缩时每次处理的向量数
+_SCAN_BLOCK = 65536
+
+
+class VectorStore(ABC):
+    """向量存储接口
+
+    RAGService 与 VectorService 只通过该接口读写向量，后端由 VECTOR_STORE_BACKEND 选择。
+    后端缺少任一抽象方法时在创建实例时即报错。
+    存储中只有分块主键和向量，文本和来源信息保存在分块存储（ChunkStore）中；
+    检索结果为包含 id 和 L2 距离平方 distance 的字典，按距离升序排列。
+    """
+
+    name = ''
+    # 检索返回的距离是否由有损压缩的向量计算，为真时 RAGService 用 get_vectors 读取的原始向量重排
+    lossy_distances = False
+
+    @abstractmethod
+    def count(self) -> int:
+        """有效记录数"""
+
+    @abstractmethod
+    def insert(self, ids: Sequence[int], vectors: np.ndarray):
+        """按分块主键写入向量，flush 后保证持久化"""
+
+    @abstractmethod
+    def delete(self, ids: Sequence[int]) -> int:
+        """按主键删除，返回删除的记录数"""
+
+    @abstractmethod
+    def flush(self):
+        """持久化已写入的记录并确保可以检索"""
+
+    @abstractmethod
+    def search(self, vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        """一次检索多个查询向量，返回每个查询最近的 limit 条记录"""
+
+    @abstractmethod
+    def get_vectors(self, ids: Sequence[int]) -> Dict[int, np.ndarray]:
+        """按主键读取写入时的向量（float32），不存在的主键不出现在结果中"""
+
+    def schedule_compaction(self):
+        """在后台清理已删除的记录，默认不需要处理"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'rows': self.count()}
+
+
+class MilvusVectorStore(VectorStore):
+    """Milvus 集合，集合句柄在服务生命周期内复用，首次检索时加载"""
+
+    name = 'milvus'
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        from services.model_registry import connect_milvus
+        from services.collection_manager import (
+            ensure_collection, get_index_type, build_search_params, load_index_settings
+        )
+        # 连接到 Milvus（进程内共享连接）
+        connect_milvus()
+        self.collection = ensure_collection(dim)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self.index_type = get_index_type(self.collection)
+        # 优先使用为该集合保存的搜索参数（由 bench_index 评估后写入）
+        settings = load_index_settings()
+        overrides = settings.get('search_params') if settings.get('index_type') == self.index_type else None
+        self.search_params = build_search_params(self.index_type, overrides)
+        print(f"索引类型 {self.index_type}，搜索参数: {self.search_params['params']}")
+
+    def _ensure_loaded(self):
+        """确保集合已加载到内存，只在首次调用时请求 Milvus"""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.collection.load()
+                    self._loaded = True
+                    print(f"成功加载集合: {self.collection.name}")
+
+    def count(self) -> int:
+        return self.collection.num_entities
+
+    def insert(self, ids: Sequence[int], vectors: np.ndarray):
+        self.collection.insert([[int(chunk_id) for chunk_id in ids], np.asarray(vectors, dtype=np.float32)])
+
+    def delete(self, ids: Sequence[int]) -> int:
+        deleted = 0
+        ids = [int(chunk_id) for chunk_id in ids]
+        for i in range(0, len(ids), _ID_BATCH):
+            deleted += self.collection.delete(f"id in {ids[i:i + _ID_BATCH]}").delete_count
+        return deleted
+
+    @property
+    def lossy_distances(self) -> bool:
+        return self.index_type in ('IVF_SQ8', 'IVF_PQ')
+
+    def flush(self):
+        self.collection.flush()
+        self._ensure_loaded()
+
+    def search(self, vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        from services.collection_manager import search_params_for_limit
+        self._ensure_loaded()
+        results = self.collection.search(
+            data=[vector.tolist() for vector in vectors],
+            anns_field="embedding",
+            param=search_params_for_limit(self.search_params, limit),
+            limit=limit
+        )
+        return [[{'id': hit.id, 'distance': hit.score} for hit in result] for result in results]
+
+    def get_vectors(self, ids: Sequence[int]) -> Dict[int, np.ndarray]:
+        self._ensure_loaded()
+        ids = [int(chunk_id) for chunk_id in ids]
+        vectors = {}
+        for i in range(0, len(ids), _ID_BATCH):
+            for row in self.collection.query(f"id in {ids[i:i + _ID_BATCH]}", output_fields=['embedding']):
+                vectors[row['id']] = np.asarray(row['embedding'], dtype=np.float32)
+        return vectors
+
+    def schedule_compaction(self):
+        from services.collection_manager import schedule_compaction
+        schedule_compaction()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'index_type': self.index_type, 'search_params': self.search_params['params']}
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """每个向量最近的聚类编号"""
+    centroid_norms = np.sum(centroids ** 2, axis=1)
+    return np.argmin(centroid_norms[None, :] - 2 * vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means 聚类，空聚类保留上一轮的中心"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest(data, centroids)
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_labels[1:] != sorted_labels[:-1])))
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        counts = np.diff(np.concatenate((starts, [len(labels)])))
+        centroids[sorted_labels[starts]] = sums / counts[:, None]
+    return centroids.astype(np.float32)
+
+
+class _View:
+    """某一时刻的数据快照，检索时不持有锁"""
+
+    __slots__ = ('rows', 'vectors', 'ids', 'norms', 'deleted', 'assignments', 'centroids', 'lists')
+
+    def __init__(self, rows, vectors, ids, norms, deleted, assignments, centroids, lists):
+        self.rows = rows
+        self.vectors = vectors
+        self.ids = ids
+        self.norms = norms
+        self.deleted = deleted
+        self.assignments = assignments
+        self.centroids = centroids
+        # IVF 倒排表 (order, offsets, indexed_rows)：order[offsets[c]:offsets[c + 1]] 为聚类 c 的行号，
+        # indexed_rows 之后追加的行尚未编入倒排表，检索时逐条比较
+        self.lists = lists
+
+
+class LocalVectorStore(VectorStore):
+    """进程内的向量存储，不依赖外部服务
+
+    向量按行追加写入数据文件并以内存映射方式读取，可按 float16 保存；主键、向量平方
+    范数、删除标记和 IVF 聚类编号保存为与向量逐行对应的数组，主键须按写入顺序递增。
+    flush 时把记录数写入 meta.json，中断前未 flush 的尾部记录在下次写入前丢弃。删除只做标记，已删除记录超过 LOCAL_COMPACT_RATIO 或需要重新训练聚类时，
+    把有效记录重写为新一代数据文件后切换 meta.json。
+    同一目录只允许一个进程写入，其他进程在检测到 meta.json 变化时重新加载。
+    """
+
+    name = 'local'
+
+    def __init__(self, directory: str = LOCAL_VECTOR_DIR, dim: int = VECTOR_DIM,
+                 dtype: str = LOCAL_VECTOR_DTYPE, index_type: str = LOCAL_INDEX_TYPE):
+        if index_type not in ('FLAT', 'IVF'):
+            raise ValueError(f"不支持的本地索引类型: {index_type}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dim = dim
+        self.index_type = index_type
+        self.configured_dtype = np.dtype(dtype)
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.lock = threading.Lock()
+        self._compaction_timer = None
+        self._load()
+        print(f"本地向量存储 {directory}: {self.count()} 条记录，{self.dtype.name}，{self.index_type}")
+
+    def _path(self, name: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"{name}.{generation:06d}.bin")
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not os.path.exists(self.meta_path):
+            return {'dim': self.dim, 'dtype': self.configured_dtype.name, 'generation': 0,
+                    'rows': 0, 'trained_rows': 0}
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        meta = {
+            'dim': self.dim,
+            'dtype': self.dtype.name,
+            'generation': self.generation,
+            'rows': self.flushed_rows,
+            'trained_rows': self.trained_rows
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self.meta_mtime = os.stat(self.meta_path).st_mtime
+
+    def _load(self):
+        meta = self._read_meta()
+        if meta['dim'] != self.dim:
+            raise ValueError(f"本地向量存储的维度 {meta['dim']} 与配置的维度 {self.dim} 不一致")
+        self.meta_mtime = os.stat(self.meta_path).st_mtime if os.path.exists(self.meta_path) else 0
+        self.dtype = np.dtype(meta['dtype'])
+        if self.dtype != self.configured_dtype:
+            print(f"注意: 配置的精度 {self.configured_dtype.name} 只对新建的存储生效，当前为 {self.dtype.name}")
+        self.generation = meta['generation']
+        self.rows = self.flushed_rows = meta['rows']
+        self.trained_rows = meta['trained_rows']
+        self.centroids = None
+        if self.trained_rows:
+            self.centroids = np.fromfile(self._path('centroids'), dtype=np.float32).reshape(-1, self.dim)
+        # 数据文件中可能有未 flush 的尾部记录，首次写入前截断
+        self._writable = False
+        self._lists = None
+        self._map()
+        if self.centroids is not None:
+            self._build_lists()
+            self._map()
+        self.deleted_count = int(np.count_nonzero(self._view.deleted))
+
+    def _open(self, name: str, dtype, rows: int, columns: int = 0, mode: str = 'r') -> np.ndarray:
+        shape = (rows, columns) if columns else (rows,)
+        if rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode=mode, shape=shape)
+
+    def _map(self):
+        """按当前记录数重新映射数据文件，生成新的快照"""
+        rows = self.rows
+        self._view = _View(
+            rows,
+            self._open('vectors', self.dtype, rows, self.dim),
+            self._open('ids', np.int64, rows),
+            self._open('norms', np.float32, rows),
+            self._open('deleted', np.uint8, rows, mode='r+'),
+            self._open('assignments', np.int32, rows) if self.centroids is not None else None,
+            self.centroids,
+            self._lists
+        )
+
+    def _build_lists(self):
+        """按聚类编号重建倒排表"""
+        assignments = np.asarray(self._open('assignments', np.int32, self.rows))
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self._lists = (order, np.concatenate(([0], np.cumsum(counts))), self.rows)
+
+    def _refresh(self):
+        """其他进程更新了存储时重新加载"""
+        if os.path.exists(self.meta_path) and os.stat(self.meta_path).st_mtime != self.meta_mtime:
+            with self.lock:
+                if self.rows == self.flushed_rows:
+                    print("检测到本地向量存储更新，重新加载")
+                    self._load()
+
+    def _prepare_write(self):
+        """首次写入前丢弃上次中断时留下的未 flush 记录，需持有锁"""
+        if self._writable:
+            return
+        names = [('vectors', self.dtype.itemsize * self.dim), ('ids', 8), ('norms', 4), ('deleted', 1)]
+        if self.centroids is not None:
+            names.append(('assignments', 4))
+        for name, row_size in names:
+            path = self._path(name)
+            with open(path, 'ab') as f:
+                if f.tell() > self.rows * row_size:
+                    f.truncate(self.rows * row_size)
+        self._writable = True
+
+    def _append(self, name: str, array: np.ndarray, generation: Optional[int] = None):
+        with open(self._path(name, generation), 'ab') as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def count(self) -> int:
+        return self.rows - self.deleted_count
+
+    def insert(self, ids: Sequence[int], vectors: np.ndarray):
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与存储维度 {self.dim} 不一致")
+        stored = vectors.astype(self.dtype)
+        # 范数按保存精度计算，与检索时读取的向量一致
+        norms = np.sum(stored.astype(np.float32) ** 2, axis=1)
+        with self.lock:
+            self._prepare_write()
+            view = self._view
+            if np.any(np.diff(ids) <= 0) or (view.rows and ids[0] <= view.ids[view.rows - 1]):
+                raise ValueError("本地向量存储的主键必须按写入顺序递增")
+            self._append('vectors', stored)
+            self._append('ids', ids)
+            self._append('norms', norms)
+            self._append('deleted', np.zeros(len(ids), dtype=np.uint8))
+            if self.centroids is not None:
+                self._append('assignments', _nearest(vectors, self.centroids))
+            self.rows += len(ids)
+            self._map()
+
+    @staticmethod
+    def _live_rows(view: _View, ids: Sequence[int]) -> np.ndarray:
+        """主键对应的未删除行号，主键按写入顺序递增，二分查找"""
+        chunk_ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(view.ids, chunk_ids)
+        found = positions < view.rows
+        found[found] = view.ids[positions[found]] == chunk_ids[found]
+        positions = positions[found]
+        return positions[view.deleted[positions] == 0]
+
+    def delete(self, ids: Sequence[int]) -> int:
+        if not len(ids):
+            return 0
+        with self.lock:
+            view = self._view
+            positions = self._live_rows(view, ids)
+            view.deleted[positions] = 1
+            if isinstance(view.deleted, np.memmap):
+                view.deleted.flush()
+            self.deleted_count += len(positions)
+            return len(positions)
+
+    def flush(self, compact: bool = False):
+        """持久化写入的记录；需要时重新训练聚类或压缩数据文件
+        Args:
+            compact: 有已删除记录时即使未超过 LOCAL_COMPACT_RATIO 也压缩
+        """
+        with self.lock:
+            live = self.count()
+            train = (self.index_type == 'IVF' and live >= LOCAL_IVF_MIN_ROWS
+                     and (not self.trained_rows or live >= 2 * self.trained_rows))
+            if compact:
+                compact = self.deleted_count > 0
+            else:
+                compact = self.deleted_count > LOCAL_COMPACT_RATIO * max(self.rows, 1)
+            if train or compact:
+                self._rewrite(train)
+                return
+            if self.rows == self.flushed_rows:
+                return
+            if self.centroids is not None:
+                self._build_lists()
+            self.flushed_rows = self.rows
+            self._write_meta()
+            self._map()
+
+    def compact(self):
+        self.flush(compact=True)
+
+    def _train(self, view: _View, keep: np.ndarray) -> np.ndarray:
+        nlist = LOCAL_IVF_NLIST or int(min(65536, max(16, 2 ** round(math.log2(4 * math.sqrt(len(keep)))))))
+        nlist = min(nlist, len(keep))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(keep, min(len(keep), nlist * 64), replace=False))
+        print(f"训练 IVF 聚类: {nlist} 个聚类，样本 {len(sample)} 条")
+        return _kmeans(np.asarray(view.vectors[sample], dtype=np.float32), nlist)
+
+    def _rewrite(self, train: bool):
+        """把有效记录写成新一代数据文件，需持有锁"""
+        view = self._view
+        keep = np.flatnonzero(view.deleted == 0)
+        centroids = self._train(view, keep) if train else self.centroids
+        generation = self.generation + 1
+        names = ['vectors', 'ids', 'norms', 'deleted'] + (['assignments'] if centroids is not None else [])
+        for name in names:
+            open(self._path(name, generation), 'wb').close()
+        for start in range(0, len(keep), _SCAN_BLOCK):
+            rows = keep[start:start + _SCAN_BLOCK]
+            block = np.asarray(view.vectors[rows])
+            self._append('vectors', block, generation)
+            self._append('ids', view.ids[rows], generation)
+            self._append('norms', view.norms[rows], generation)
+            self._append('deleted', np.zeros(len(rows), dtype=np.uint8), generation)
+            if train:
+                self._append('assignments', _nearest(block.astype(np.float32), centroids), generation)
+            elif centroids is not None:
+                self._append('assignments', view.assignments[rows], generation)
+        if centroids is not None:
+            self._append('centroids', centroids, generation)
+
+        old_generation = self.generation
+        self.generation = generation
+        self.rows = self.flushed_rows = len(keep)
+        self.deleted_count = 0
+        self.centroids = centroids
+        if train:
+            self.trained_rows = len(keep)
+        self._write_meta()
+        self._writable = True
+        if centroids is not None:
+            self._build_lists()
+        self._map()
+        for name in names + ['centroids']:
+            path = self._path(name, old_generation)
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"本地向量存储已重写: {len(keep)} 条有效记录，删除 {view.rows - len(keep)} 条")
+
+    def schedule_compaction(self, delay: float = COMPACTION_DELAY):
+        """延迟压缩，延迟期间的多次删除只触发一次"""
+        with self.lock:
+            if self._compaction_timer is not None:
+                return
+            self._compaction_timer = threading.Timer(delay, self._run_compaction)
+            self._compaction_timer.daemon = True
+            self._compaction_timer.start()
+
+    def _run_compaction(self):
+        with self.lock:
+            self._compaction_timer = None
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"压缩本地向量存储失败: {str(e)}")
+
+    def _top_k(self, view: _View, queries: np.ndarray, rows: Optional[np.ndarray],
+               limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """在给定行（None 表示全部）中精确计算距离，返回每个查询最近的行号和距离（未加查询范数）"""
+        total = view.rows if rows is None else len(rows)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_distances = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, total, _SCAN_BLOCK):
+            end = min(start + _SCAN_BLOCK, total)
+            if rows is None:
+                block_rows = np.arange(start, end)
+                selector = slice(start, end)
+            else:
+                block_rows = selector = rows[start:end]
+            block = np.asarray(view.vectors[selector], dtype=np.float32)
+            distances = view.norms[selector][None, :] - 2 * queries @ block.T
+            distances[:, view.deleted[selector] != 0] = np.inf
+            best_rows = np.hstack((best_rows, np.broadcast_to(block_rows, distances.shape)))
+            best_distances = np.hstack((best_distances, distances))
+            if best_distances.shape[1] > limit:
+                top = np.argpartition(best_distances, limit, axis=1)[:, :limit]
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+                best_distances = np.take_along_axis(best_distances, top, axis=1)
+        order = np.argsort(best_distances, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_distances, order, axis=1)
+
+    def search(self, vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        self._refresh()
+        view = self._view
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if view.rows == 0 or limit <= 0:
+            return [[] for _ in queries]
+
+        if self.index_type == 'IVF' and view.lists is not None:
+            # 每个查询只扫描最近的 nprobe 个聚类和尚未编入倒排表的新记录
+            order, offsets, indexed_rows = view.lists
+            nprobe = min(LOCAL_IVF_NPROBE, len(view.centroids))
+            centroid_distances = np.sum(view.centroids ** 2, axis=1)[None, :] - 2 * queries @ view.centroids.T
+            probes = np.argpartition(centroid_distances, nprobe - 1, axis=1)[:, :nprobe]
+            tail = np.arange(indexed_rows, view.rows)
+            results = []
+            for query, clusters in zip(queries, probes):
+                rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in clusters] + [tail]))
+                results.append(self._top_k(view, query[None, :], rows, limit))
+            top_rows = [rows[0] for rows, _ in results]
+            top_distances = [distances[0] for _, distances in results]
+        else:
+            top_rows, top_distances = self._top_k(view, queries, None, limit)
+
+        query_norms = np.sum(queries ** 2, axis=1)
+        results = []
+        for rows, distances, query_norm in zip(top_rows, top_distances, query_norms):
+            valid = np.isfinite(distances)
+            results.append([
+                {'id': chunk_id, 'distance': distance}
+                for chunk_id, distance in zip(view.ids[rows[valid]].tolist(),
+                                              np.maximum(distances[valid] + query_norm, 0).tolist())
+            ])
+        return results
+
+    def get_vectors(self, ids: Sequence[int]) -> Dict[int, np.ndarray]:
+        self._refresh()
+        view = self._view
+        if view.rows == 0 or not len(ids):
+            return {}
+        rows = self._live_rows(view, sorted(ids))
+        vectors = np.asarray(view.vectors[rows], dtype=np.float32)
+        return dict(zip(view.ids[rows].tolist(), vectors))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            'deleted': self.deleted_count,
+            'dtype': self.dtype.name,
+            'index_type': self.index_type,
+            'nlist': 0 if self.centroids is None else len(self.centroids)
+        }
+
+
+def create_vector_store(backend: str = VECTOR_STORE_BACKEND) -> VectorStore:
+    if backend == 'milvus':
+        return MilvusVectorStore()
+    if backend == 'local':
+        return LocalVectorStore()
+    raise ValueError(f"不支持的向量存储后端: {backend}")
+
+
+_shared_store: Optional[VectorStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """获取进程内共享的向量存储"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = create_vector_store()
+        return _shared_store
+
+
+_insert_lock = threading.Lock()
+
+
+def insert_chunks(store: VectorStore, rows: Sequence[Dict[str, Any]]) -> List[int]:
+    """写入带 embedding 的分块：文本和来源信息写入分块存储，向量按分配的主键写入向量存储
+
+    主键分配与向量写入在同一把锁内完成，并发写入时向量存储收到的主键仍按顺序递增；
+    向量写入失败时删除刚写入的分块，两边的记录保持一致。
+    Returns:
+        与记录一一对应的分块主键
+    """
+    from services.chunk_store import get_chunk_store
+    if not rows:
+        return []
+    # embedding 通常是向量模型输出的 numpy 行，直接拼接为一个数组
+    vectors = np.stack([row['embedding'] for row in rows]).astype(np.float32, copy=False)
+    chunks = get_chunk_store()
+    with _insert_lock:
+        ids = chunks.add(rows)
+        try:
+            store.insert(ids, vectors)
+        except Exception:
+            chunks.delete(ids)
+            raise
+    return ids